@@ -7,16 +7,26 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 from sqlalchemy.orm import DeclarativeBase
 from datetime import datetime
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import text
 
 # Import models and db from models module
 from models import db, User, Report
-from services.neo4j_service import Neo4jService
+from services.neo4j_service import Neo4jService, COMPANY_LABELS
+from services.graph_snapshot import GraphSnapshot
 from services.n8n_service import N8nService
 from services.auth_service import AuthService
+from services.report_queue import ReportJobQueue
+from services.report_storage import ReportStorage
+from services.report_events import ReportEventBroker
+from services.file_reaper import FileReaper
+from services.chat_cache import ChatAnswerCache
+from services.conversations import backfill_conversations
+from services.index_maintenance import ensure_indexes_concurrently
+from services.report_retention import ReportArchive, ReportRetention, parse_retention_policies
 
 # Import routes
-from routes.auth import auth_bp
+from routes.auth import auth_bp, admin_required
 from routes.dashboard import dashboard_bp
 from routes.reports import reports_bp
 from routes.suk_chat import suk_chat_bp
@@ -27,18 +37,12 @@ def create_app():
 
     # Configure app
     app.secret_key = os.environ.get("SESSION_SECRET")
-    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
     # Add proxy fix for Replit
     app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
     # Initialize extensions
-    db.init_app(app)
+    init_database(app)
     # Configure CORS for Replit environment - more secure than wildcard
     allowed_origins = [
         "https://*.replit.app",
@@ -64,9 +68,28 @@ def create_app():
     neo4j_service = Neo4jService(
         uri=os.getenv('NEO4J_URI', 'bolt://localhost:7687'),
         username=os.getenv('NEO4J_USERNAME', 'neo4j'),
-        password=os.getenv('NEO4J_PASSWORD', 'password')
+        password=os.getenv('NEO4J_PASSWORD', 'password'),
+        cache_ttls={
+            'SUK': int(os.getenv('NEO4J_CACHE_TTL_SUK', '300')),
+            'FEDERTERZIARIO': int(os.getenv('NEO4J_CACHE_TTL_FEDERTERZIARIO', '300')),
+            'STARTUP': int(os.getenv('NEO4J_CACHE_TTL_STARTUP', '300'))
+        },
+        cache_max_entries=int(os.getenv('NEO4J_CACHE_MAX_ENTRIES', '256')),
+        bootstrap_schema=os.getenv('NEO4J_SCHEMA_BOOTSTRAP', 'true').lower() == 'true',
+        slow_query_threshold=float(os.getenv('NEO4J_SLOW_QUERY_MS', '500')) / 1000,
+        profile_sample_rate=float(os.getenv('NEO4J_PROFILE_SAMPLE_RATE', '0'))
     )
 
+    # Keep relationship lookups for the network views in memory
+    if neo4j_service.driver and os.getenv('GRAPH_SNAPSHOT_ENABLED', 'true').lower() == 'true':
+        neo4j_service.snapshot = GraphSnapshot(
+            neo4j_service,
+            labels=COMPANY_LABELS,
+            refresh_interval=int(os.getenv('GRAPH_SNAPSHOT_REFRESH_INTERVAL', '300')),
+            max_age=int(os.getenv('GRAPH_SNAPSHOT_MAX_AGE', '900'))
+        )
+        neo4j_service.snapshot.start()
+
     n8n_service = N8nService(
         base_url=os.getenv('N8N_BASE_URL', 'http://localhost:5678'),
         api_key=os.getenv('N8N_API_KEY', 'default_key'),
@@ -79,7 +102,61 @@ def create_app():
     app.config['neo4j_service'] = neo4j_service
     app.config['n8n_service'] = n8n_service
     app.config['auth_service'] = auth_service
+    # Bounded pool used by the dashboard to query Neo4j and PostgreSQL concurrently
+    app.config['dashboard_executor'] = ThreadPoolExecutor(
+        max_workers=int(os.getenv('DASHBOARD_MAX_WORKERS', '8')),
+        thread_name_prefix='dashboard'
+    )
+    app.config['DASHBOARD_SOURCE_TIMEOUT'] = float(os.getenv('DASHBOARD_SOURCE_TIMEOUT', '10'))
+    # Products and suppliers kept per chat answer, highest ranking first
+    app.config['CHAT_TOP_K'] = int(os.getenv('CHAT_TOP_K', '10'))
+    # Answers to repeated chat questions, keyed on the normalized message and filters
+    app.config['chat_cache'] = ChatAnswerCache(
+        enabled_types=[chat_type for chat_type in ('SUK', 'STARTUP')
+                       if os.getenv(f'CHAT_CACHE_ENABLED_{chat_type}', 'true').lower() == 'true'],
+        ttl=int(os.getenv('CHAT_CACHE_TTL', '3600')),
+        max_entries=int(os.getenv('CHAT_CACHE_MAX_ENTRIES', '512'))
+    )
     app.config['N8N_REPORT_WEBHOOK_URL'] = os.getenv('N8N_REPORT_WEBHOOK_URL', 'http://host.docker.internal:5678/webhook/baf08e2e-8b5b-414e-bde2-109cec9b60ab')
+    # Completion callbacks from n8n (disabled when no secret is set); the base URL must be reachable from n8n
+    app.config['N8N_CALLBACK_SECRET'] = os.getenv('N8N_CALLBACK_SECRET', '')
+    app.config['N8N_CALLBACK_BASE_URL'] = os.getenv('N8N_CALLBACK_BASE_URL', 'http://host.docker.internal:8001')
+
+    report_storage, file_reaper, report_retention = init_report_files(app)
+    # Let a front proxy serve report PDFs: 'x-accel' (nginx), 'x-sendfile' (Apache/lighttpd) or empty
+    app.config['REPORTS_SENDFILE_MODE'] = os.getenv('REPORTS_SENDFILE_MODE', '').lower()
+    app.config['REPORTS_ACCEL_PREFIX'] = os.getenv('REPORTS_ACCEL_PREFIX', '/protected-reports')
+    app.config['REPORTS_CACHE_MAX_AGE'] = int(os.getenv('REPORTS_CACHE_MAX_AGE', '3600'))
+
+    # Seconds during which a completed report for the same company and type is reused (0 disables)
+    app.config['REPORT_REUSE_WINDOW'] = int(os.getenv('REPORT_REUSE_WINDOW', '3600'))
+
+    # Upper bound on concurrently running webhook calls per bulk generation batch
+    app.config['REPORT_BATCH_MAX_CONCURRENCY'] = int(os.getenv('REPORT_BATCH_MAX_CONCURRENCY', '2'))
+
+    # Pushes report status changes to /api/reports/events streams
+    report_events = ReportEventBroker()
+    app.config['report_events'] = report_events
+    app.config['REPORT_EVENTS_HEARTBEAT'] = int(os.getenv('REPORT_EVENTS_HEARTBEAT', '15'))
+    app.config['REPORT_EVENTS_RECONCILE_INTERVAL'] = int(os.getenv('REPORT_EVENTS_RECONCILE_INTERVAL', '30'))
+    app.config['REPORT_EVENTS_MAX_DURATION'] = int(os.getenv('REPORT_EVENTS_MAX_DURATION', '300'))
+
+    # Background pool that calls the report webhook, so /api/reports/generate returns immediately
+    report_queue = ReportJobQueue(
+        webhook_url=app.config['N8N_REPORT_WEBHOOK_URL'],
+        max_workers=int(os.getenv('REPORT_WORKERS', '4')),
+        poll_interval=float(os.getenv('REPORT_QUEUE_POLL_INTERVAL', '5')),
+        webhook_timeout=int(os.getenv('REPORT_WEBHOOK_TIMEOUT', '300')),
+        max_attempts=int(os.getenv('REPORT_JOB_MAX_ATTEMPTS', '3')),
+        retry_delay=int(os.getenv('REPORT_JOB_RETRY_DELAY', '30')),
+        stale_after=int(os.getenv('REPORT_JOB_STALE_AFTER', '900')),
+        storage=report_storage,
+        events=report_events,
+        callback_base_url=app.config['N8N_CALLBACK_BASE_URL'],
+        callback_secret=app.config['N8N_CALLBACK_SECRET']
+    )
+    report_queue.init_app(app)
+    app.config['report_queue'] = report_queue
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api')
@@ -108,6 +185,21 @@ def create_app():
     def health_check():
         return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
 
+    @app.route('/api/metrics')
+    @admin_required
+    def metrics():
+        neo4j_service = app.config['neo4j_service']
+        return jsonify({
+            'neo4j': neo4j_service.metrics.snapshot(),
+            'neo4j_cache': neo4j_service.cache_stats(),
+            'chat_cache': app.config['chat_cache'].stats(),
+            'report_queue': app.config['report_queue'].stats(),
+            'report_events': app.config['report_events'].stats(),
+            'file_reaper': app.config['file_reaper'].stats(),
+            'report_retention': app.config['report_retention'].stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+
     @app.errorhandler(404)
     def not_found(error):
         return send_from_directory('static', 'index.html')
@@ -118,8 +210,70 @@ def create_app():
         run_database_migrations()
         create_admin_user()
 
+    file_reaper.start()
+
+    # Scheduled retention runs (hours, 0 disables; python manage_reports.py runs it on demand)
+    retention_interval = float(os.getenv('REPORT_RETENTION_INTERVAL_HOURS', '0'))
+    if retention_interval > 0:
+        report_retention.start(retention_interval * 3600)
+
+    # Workers can be disabled on extra web processes that share the same database
+    if os.getenv('REPORT_QUEUE_ENABLED', 'true').lower() == 'true':
+        report_queue.start()
+
     return app
 
+def init_database(app):
+    """Configure SQLAlchemy for DATABASE_URL and bind db to the app"""
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+
+def init_report_files(app):
+    """Set up report file storage, the file reaper and retention (no threads are started)"""
+    report_storage = ReportStorage(
+        reports_dir=os.getenv('REPORTS_DIR', 'reports'),
+        max_file_size=int(os.getenv('REPORT_MAX_FILE_SIZE_MB', '100')) * 1024 * 1024
+    )
+    app.config['report_storage'] = report_storage
+    # Unlinks the files of deleted reports off the request thread
+    file_reaper = FileReaper(
+        report_storage,
+        batch_size=int(os.getenv('FILE_REAPER_BATCH_SIZE', '100')),
+        max_attempts=int(os.getenv('FILE_REAPER_MAX_ATTEMPTS', '5'))
+    )
+    file_reaper.init_app(app)
+    app.config['file_reaper'] = file_reaper
+
+    # Retention policies per report_type: archive old PDFs into cold bundles, expire old reports
+    # Bundles live under the reports directory by default so they share its persistent volume
+    report_archive = ReportArchive(
+        report_storage,
+        archive_dir=os.getenv('REPORTS_ARCHIVE_DIR', os.path.join(report_storage.reports_dir, 'archive'))
+    )
+    try:
+        retention_policies = parse_retention_policies(os.getenv('REPORT_RETENTION_POLICIES', ''))
+    except ValueError as e:
+        logging.error(f"Invalid REPORT_RETENTION_POLICIES, retention disabled: {str(e)}")
+        retention_policies = {}
+    report_retention = ReportRetention(
+        report_storage,
+        report_archive,
+        retention_policies,
+        file_reaper=file_reaper,
+        bundle_size=int(os.getenv('REPORT_ARCHIVE_BUNDLE_SIZE', '500')),
+        orphan_grace=int(os.getenv('REPORT_ORPHAN_GRACE', '3600'))
+    )
+    report_retention.init_app(app)
+    app.config['report_archive'] = report_archive
+    app.config['report_retention'] = report_retention
+
+    return report_storage, file_reaper, report_retention
+
 def run_database_migrations():
     """Run database migrations to update schema"""
     try:
@@ -137,12 +291,52 @@ def run_database_migrations():
                 WHERE report_type IS NULL
             """))
 
+            # Add error_message column to reports table if it doesn't exist
+            conn.execute(text("""
+                ALTER TABLE reports 
+                ADD COLUMN IF NOT EXISTS error_message TEXT
+            """))
+
+            # Add file_size and checksum columns to reports table if they don't exist
+            conn.execute(text("""
+                ALTER TABLE reports 
+                ADD COLUMN IF NOT EXISTS file_size BIGINT
+            """))
+
+            conn.execute(text("""
+                ALTER TABLE reports 
+                ADD COLUMN IF NOT EXISTS checksum VARCHAR(64)
+            """))
+
             # Add chat_type column to chat_messages table if it doesn't exist
             conn.execute(text("""
                 ALTER TABLE chat_messages 
                 ADD COLUMN IF NOT EXISTS chat_type VARCHAR(20) DEFAULT 'SUK'
             """))
 
+            # Add conversation_id column to chat_messages table if it doesn't exist
+            conn.execute(text("""
+                ALTER TABLE chat_messages 
+                ADD COLUMN IF NOT EXISTS conversation_id INTEGER REFERENCES conversations(id) ON DELETE CASCADE
+            """))
+
+            # Add archived_in column for archived report files if it doesn't exist
+            conn.execute(text("""
+                ALTER TABLE reports 
+                ADD COLUMN IF NOT EXISTS archived_in VARCHAR(500)
+            """))
+
+            # Add batch_id columns for bulk report generation if they don't exist
+            conn.execute(text("""
+                ALTER TABLE reports 
+                ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES report_batches(id) ON DELETE SET NULL
+            """))
+
+            conn.execute(text("""
+                ALTER TABLE report_jobs 
+                ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES report_batches(id) ON DELETE SET NULL
+            """))
+
             # Create performance indexes
             conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_reports_user_id_type 
@@ -154,11 +348,64 @@ def run_database_migrations():
                 ON reports(created_at DESC)
             """))
 
+            # Keyset pagination indexes for the report history
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_reports_user_created 
+                ON reports(user_id, created_at DESC, id DESC)
+            """))
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_reports_user_type_created 
+                ON reports(user_id, report_type, created_at DESC, id DESC)
+            """))
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_reports_user_status_created 
+                ON reports(user_id, status, created_at DESC, id DESC)
+            """))
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_reports_company_type_created 
+                ON reports(company_name, report_type, created_at DESC)
+            """))
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_reports_batch_id 
+                ON reports(batch_id)
+            """))
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_report_jobs_batch_status 
+                ON report_jobs(batch_id, status)
+            """))
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_reports_archived_in 
+                ON reports(archived_in)
+            """))
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_reports_file_path 
+                ON reports(file_path)
+            """))
+
             conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_type 
                 ON chat_messages(chat_type)
             """))
 
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_conversations_user_type_activity 
+                ON conversations(user_id, chat_type, last_activity, id)
+            """))
+
+            conn.commit()
+
+            # Composite chat indexes are built online so startup never locks chat_messages
+            ensure_indexes_concurrently(db.engine)
+
+            # Group messages saved before the conversations table existed
+            backfill_conversations(conn)
             conn.commit()
 
         logging.info("Database migrations completed successfully")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Neo4j schema bootstrap script for ICorNet
+Creates the range and full-text indexes used by the application and reports their state.
+"""
+
+import os
+import sys
+import logging
+from dotenv import load_dotenv
+from services.neo4j_service import Neo4jService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def print_report(report):
+    """Log one line per managed index"""
+    for index in report:
+        status = "created" if index['created'] else "present"
+        if index['state'] == 'MISSING':
+            status = "missing"
+        population = index['population_percent']
+        population = f"{population:.1f}%" if population is not None else "-"
+        logger.info(f"{index['name']:<32} {index['type']:<9} :{index['label']}({', '.join(index['properties'])}) "
+                    f"{status}, state={index['state']}, populated={population}")
+
+def run_bootstrap(create=True):
+    """Create missing indexes (unless create is False) and report their state"""
+    neo4j_service = Neo4jService(
+        uri=os.getenv('NEO4J_URI', 'bolt://localhost:7687'),
+        username=os.getenv('NEO4J_USERNAME', 'neo4j'),
+        password=os.getenv('NEO4J_PASSWORD', 'password'),
+        bootstrap_schema=False
+    )
+
+    if not neo4j_service.driver:
+        logger.error("Neo4j is not reachable, aborting")
+        sys.exit(1)
+
+    try:
+        report = neo4j_service.ensure_schema(create=create)
+    finally:
+        neo4j_service.close()
+
+    if not report:
+        logger.error("Schema bootstrap failed, see errors above")
+        sys.exit(1)
+
+    print_report(report)
+    return report
+
+if __name__ == "__main__":
+    load_dotenv()
+    logger.info("Starting ICorNet Neo4j schema bootstrap...")
+
+    report = run_bootstrap(create="--verify" not in sys.argv)
+
+    if any(index['state'] == 'MISSING' for index in report):
+        logger.warning("Some indexes are missing, run without --verify to create them")
+    logger.info("Schema bootstrap completed")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Report retention script for ICorNet
+Applies REPORT_RETENTION_POLICIES once: expires old reports, archives old PDFs
+into compressed bundles and removes files and bundles no report refers to.
+"""
+
+import sys
+import logging
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def run_retention(dry_run=False):
+    """Run one retention pass and wait for expired files to be deleted"""
+    # Only the database and report file services: no Neo4j, migrations or background threads
+    from flask import Flask
+    from app import init_database, init_report_files
+    app = Flask(__name__)
+    init_database(app)
+    _, file_reaper, retention = init_report_files(app)
+
+    if not retention.policies:
+        logger.warning("REPORT_RETENTION_POLICIES is empty, only orphaned files will be removed")
+
+    with app.app_context():
+        summary = retention.run(dry_run=dry_run)
+
+    if summary is None:
+        logger.error("Another retention run holds the lock, aborting")
+        sys.exit(1)
+
+    # Files of expired reports were queued on the reaper; delete them before exiting
+    while file_reaper.reap_batch():
+        pass
+
+    return summary
+
+if __name__ == "__main__":
+    load_dotenv()
+    dry_run = "--dry-run" in sys.argv
+    logger.info(f"Starting ICorNet report retention{' (dry run)' if dry_run else ''}...")
+
+    summary = run_retention(dry_run=dry_run)
+
+    logger.info(f"Expired reports: {summary['expired_reports']}")
+    logger.info(f"Archived files: {summary['archived_files']}")
+    logger.info(f"Orphaned files: {summary['orphaned_files']}")
+    logger.info(f"Orphaned bundles: {summary['orphaned_bundles']}")
+    logger.info("Report retention completed")
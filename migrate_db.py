@@ -10,7 +10,9 @@ import sys
 import logging
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
-from models import db, User, Report, Session, ChatMessage
+from models import db, User, Report, ReportBatch, ReportJob, Session, ChatMessage, Conversation
+from services.conversations import backfill_conversations
+from services.index_maintenance import CHAT_MESSAGE_INDEXES, ensure_indexes_concurrently, index_usage_report
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -52,6 +54,36 @@ def run_migrations():
                 """))
                 logger.info(f"Updated {result.rowcount} records with default report_type")
                 
+                # Add error_message column used by the report job queue
+                logger.info("Adding error_message column to reports table...")
+                conn.execute(text("""
+                    ALTER TABLE reports 
+                    ADD COLUMN IF NOT EXISTS error_message TEXT
+                """))
+                
+                # Add archived_in column for report retention
+                logger.info("Adding archived_in column to reports table...")
+                conn.execute(text("""
+                    ALTER TABLE reports 
+                    ADD COLUMN IF NOT EXISTS archived_in VARCHAR(500)
+                """))
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_reports_archived_in 
+                    ON reports(archived_in)
+                """))
+                
+                # report_batches table and batch_id column for bulk report generation
+                logger.info("Creating report_batches table and reports.batch_id column...")
+                ReportBatch.__table__.create(conn, checkfirst=True)
+                conn.execute(text("""
+                    ALTER TABLE reports 
+                    ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES report_batches(id) ON DELETE SET NULL
+                """))
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_reports_batch_id 
+                    ON reports(batch_id)
+                """))
+                
                 # 3. Ensure chat_messages table has proper structure
                 logger.info("Updating chat_messages table structure...")
                 conn.execute(text("""
@@ -59,6 +91,14 @@ def run_migrations():
                     ADD COLUMN IF NOT EXISTS user_id VARCHAR(100)
                 """))
                 
+                # conversations table and chat_messages.conversation_id
+                logger.info("Creating conversations table and chat_messages.conversation_id column...")
+                Conversation.__table__.create(conn, checkfirst=True)
+                conn.execute(text("""
+                    ALTER TABLE chat_messages 
+                    ADD COLUMN IF NOT EXISTS conversation_id INTEGER REFERENCES conversations(id) ON DELETE CASCADE
+                """))
+                
                 # 4. Create indexes for better performance
                 logger.info("Creating database indexes...")
                 conn.execute(text("""
@@ -71,6 +111,32 @@ def run_migrations():
                     ON reports(created_at DESC)
                 """))
                 
+                # Keyset pagination indexes for the report history
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_reports_user_created 
+                    ON reports(user_id, created_at DESC, id DESC)
+                """))
+                
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_reports_user_type_created 
+                    ON reports(user_id, report_type, created_at DESC, id DESC)
+                """))
+                
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_reports_user_status_created 
+                    ON reports(user_id, status, created_at DESC, id DESC)
+                """))
+                
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_reports_company_type_created 
+                    ON reports(company_name, report_type, created_at DESC)
+                """))
+                
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_reports_file_path 
+                    ON reports(file_path)
+                """))
+                
                 conn.execute(text("""
                     CREATE INDEX IF NOT EXISTS idx_chat_messages_user_id 
                     ON chat_messages(user_id)
@@ -81,6 +147,29 @@ def run_migrations():
                     ON chat_messages(timestamp DESC)
                 """))
                 
+                # Add file_size and checksum columns for streamed PDF ingestion
+                logger.info("Adding file_size and checksum columns to reports table...")
+                conn.execute(text("""
+                    ALTER TABLE reports 
+                    ADD COLUMN IF NOT EXISTS file_size BIGINT
+                """))
+                conn.execute(text("""
+                    ALTER TABLE reports 
+                    ADD COLUMN IF NOT EXISTS checksum VARCHAR(64)
+                """))
+                
+                # report_jobs table for the background report queue
+                logger.info("Creating report_jobs table...")
+                ReportJob.__table__.create(conn, checkfirst=True)
+                conn.execute(text("""
+                    ALTER TABLE report_jobs 
+                    ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES report_batches(id) ON DELETE SET NULL
+                """))
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_report_jobs_batch_status 
+                    ON report_jobs(batch_id, status)
+                """))
+                
                 # Commit transaction
                 trans.commit()
                 logger.info("All migrations completed successfully!")
@@ -89,6 +178,24 @@ def run_migrations():
                 trans.rollback()
                 logger.error(f"Migration failed, rolling back: {str(e)}")
                 raise
+        
+        # Composite chat indexes: CREATE INDEX CONCURRENTLY needs its own autocommit connection
+        logger.info("Creating chat_messages composite indexes concurrently...")
+        results = ensure_indexes_concurrently(engine)
+        if results is None:
+            logger.warning("Skipped concurrent index build: another process holds the lock")
+        else:
+            for name, state in results.items():
+                logger.info(f"{name}: {state}")
+            if 'failed' in results.values():
+                raise RuntimeError("Some indexes could not be created, see errors above")
+        
+        # The backfill scans chat_messages per (user_id, chat_type) in timestamp order,
+        # so it runs once the composite indexes exist, in a transaction of its own
+        logger.info("Backfilling conversations for existing chat messages...")
+        with engine.begin() as conn:
+            created = backfill_conversations(conn)
+        logger.info(f"Created {created} conversations")
                 
     except SQLAlchemyError as e:
         logger.error(f"Database connection failed: {str(e)}")
@@ -130,6 +237,22 @@ def verify_schema():
             else:
                 logger.warning("⚠ Some performance indexes may be missing")
             
+            # Check chat composite indexes (an interrupted concurrent build leaves them invalid)
+            result = conn.execute(text("""
+                SELECT c.relname, i.indisvalid 
+                FROM pg_index i 
+                JOIN pg_class c ON c.oid = i.indexrelid 
+                WHERE c.relname = ANY(:names)
+            """), {'names': list(CHAT_MESSAGE_INDEXES)})
+            chat_indexes = dict(result.fetchall())
+            for name in CHAT_MESSAGE_INDEXES:
+                if chat_indexes.get(name):
+                    logger.info(f"✓ {name} is in place")
+                elif name in chat_indexes:
+                    logger.warning(f"⚠ {name} is INVALID, run the migration again to rebuild it")
+                else:
+                    logger.warning(f"⚠ {name} is missing")
+            
             logger.info("Schema verification completed")
             return True
             
@@ -137,10 +260,33 @@ def verify_schema():
         logger.error(f"Schema verification failed: {str(e)}")
         return False
 
+def report_index_usage():
+    """Log how often each chat index and table has been scanned"""
+    engine = create_engine(get_database_url())
+    
+    try:
+        with engine.connect() as conn:
+            usage = index_usage_report(conn)
+    except Exception as e:
+        logger.error(f"Index usage report failed: {str(e)}")
+        return None
+    
+    for table in usage['tables']:
+        logger.info(f"{table['table_name']}: {table['n_live_tup']} rows, seq_scan={table['seq_scan']} "
+                    f"(rows read {table['seq_tup_read']}), idx_scan={table['idx_scan']}")
+    for index in usage['indexes']:
+        status = "" if index['valid'] else " INVALID"
+        unused = " (unused)" if not index['idx_scan'] else ""
+        logger.info(f"  {index['index_name']:<44} scans={index['idx_scan']:<10} "
+                    f"tuples read={index['idx_tup_read']:<12} size={index['size_bytes'] // 1024} kB{status}{unused}")
+    return usage
+
 if __name__ == "__main__":
     logger.info("Starting ICorNet database migration...")
     
-    if "--verify" in sys.argv:
+    if "--index-usage" in sys.argv:
+        report_index_usage()
+    elif "--verify" in sys.argv:
         verify_schema()
     else:
         run_migrations()
@@ -45,6 +45,11 @@ class Report(db.Model):
     file_name = db.Column(db.String(255))
     file_path = db.Column(db.String(500))
     workflow_id = db.Column(db.String(100))
+    batch_id = db.Column(db.Integer, db.ForeignKey('report_batches.id', ondelete='SET NULL'), index=True)
+    file_size = db.Column(db.BigInteger)
+    checksum = db.Column(db.String(64))  # SHA-256 hex digest of the PDF
+    archived_in = db.Column(db.String(500))  # archive bundle holding a copy of the file
+    error_message = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -58,10 +63,70 @@ class Report(db.Model):
             'file_name': self.file_name,
             'file_path': self.file_path,
             'workflow_id': self.workflow_id,
+            'batch_id': self.batch_id,
+            'file_size': self.file_size,
+            'checksum': self.checksum,
+            'archived_in': self.archived_in,
+            'error_message': self.error_message,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class ReportBatch(db.Model):
+    __tablename__ = 'report_batches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    report_type = db.Column(db.String(50), default='suk')
+    sector = db.Column(db.String(255))
+    total = db.Column(db.Integer, nullable=False, default=0)
+    max_concurrency = db.Column(db.Integer, nullable=False, default=2)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'report_type': self.report_type,
+            'sector': self.sector,
+            'total': self.total,
+            'max_concurrency': self.max_concurrency,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, db.ForeignKey('reports.id', ondelete='CASCADE'), nullable=False, index=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('report_batches.id', ondelete='SET NULL'))  # copied from the report for dispatch limits
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'awaiting_callback', 'completed' or 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_report_jobs_status_available', 'status', 'available_at'),
+        db.Index('idx_report_jobs_batch_status', 'batch_id', 'status'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'report_id': self.report_id,
+            'batch_id': self.batch_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'available_at': self.available_at.isoformat() if self.available_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
 class Session(db.Model):
     __tablename__ = 'sessions'
 
@@ -70,6 +135,31 @@ class Session(db.Model):
     data = db.Column(db.Text)
     expires_at = db.Column(db.DateTime)
 
+class Conversation(db.Model):
+    __tablename__ = 'conversations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False, default='anonymous')
+    chat_type = db.Column(db.String(20), nullable=False, default='SUK')  # 'SUK' or 'STARTUP'
+    title = db.Column(db.String(255), nullable=False)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_activity = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_conversations_user_type_activity', 'user_id', 'chat_type', 'last_activity', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'chat_type': self.chat_type,
+            'message_count': self.message_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_activity': self.last_activity.isoformat() if self.last_activity else None
+        }
+
 class ChatMessage(db.Model):
     __tablename__ = 'chat_messages'
 
@@ -79,14 +169,21 @@ class ChatMessage(db.Model):
     user_id = db.Column(db.String(100), nullable=False, default='anonymous')
     chat_type = db.Column(db.String(20), nullable=False, default='SUK')  # 'SUK' or 'STARTUP'
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id', ondelete='CASCADE'))
 
     # Note: Removed foreign key relationship to support anonymous users
 
+    __table_args__ = (
+        db.Index('idx_chat_messages_user_type_timestamp', 'user_id', 'chat_type', 'timestamp', 'id'),
+        db.Index('idx_chat_messages_conversation_timestamp', 'conversation_id', 'timestamp', 'id'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
             'content': self.content,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'message_type': self.message_type,
-            'user_id': self.user_id
+            'user_id': self.user_id,
+            'conversation_id': self.conversation_id
         }
\ No newline at end of file
@@ -0,0 +1,73 @@
+from collections import defaultdict
+from datetime import datetime
+
+from flask import request
+
+from models import db, ChatMessage, Conversation
+from routes.pagination import parse_limit, encode_cursor, decode_cursor
+
+DEFAULT_CONVERSATION_PAGE_SIZE = 20
+MAX_CONVERSATION_PAGE_SIZE = 100
+
+
+def _message_dict(message):
+    return {
+        'content': message.content,
+        'message_type': message.message_type,
+        'timestamp': message.timestamp.isoformat() if message.timestamp else None
+    }
+
+
+def chat_history_response(user_id, chat_type):
+    """Build a page of conversations, most recently active first.
+
+    `limit` bounds the number of conversations and `before` is the
+    next_cursor of the previous page; pages are keyset ranges on
+    (last_activity, id) of the conversations table, and the messages of the
+    page are loaded with one query on conversation_id.
+
+    Raises ValueError on an invalid limit or cursor.
+    """
+    limit = parse_limit(default=DEFAULT_CONVERSATION_PAGE_SIZE, maximum=MAX_CONVERSATION_PAGE_SIZE)
+    before = request.args.get('before')
+
+    query = Conversation.query.filter(Conversation.user_id == str(user_id), Conversation.chat_type == chat_type)
+    if before:
+        before_activity, before_id = decode_cursor(before, 2)
+        try:
+            before_activity = datetime.fromisoformat(before_activity)
+            before_id = int(before_id)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+        query = query.filter(db.or_(
+            Conversation.last_activity < before_activity,
+            db.and_(Conversation.last_activity == before_activity, Conversation.id < before_id)
+        ))
+
+    conversations = query.order_by(Conversation.last_activity.desc(), Conversation.id.desc()).limit(limit + 1).all()
+    has_more = len(conversations) > limit
+    conversations = conversations[:limit]
+
+    messages_by_conversation = defaultdict(list)
+    if conversations:
+        messages = ChatMessage.query.filter(ChatMessage.conversation_id.in_([c.id for c in conversations])) \
+            .order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc()).all()
+        for message in messages:
+            messages_by_conversation[message.conversation_id].append(_message_dict(message))
+
+    page = []
+    for conversation in conversations:
+        messages = messages_by_conversation[conversation.id]
+        page.append({
+            **conversation.to_dict(),
+            'timestamp': conversation.created_at.isoformat(),
+            'messages': messages
+        })
+
+    last = conversations[-1] if conversations else None
+    return {
+        'conversations': page,
+        'next_cursor': encode_cursor(last.last_activity.isoformat(), last.id) if has_more else None,
+        'has_more': has_more,
+        'success': True
+    }
@@ -1,59 +1,160 @@
 from flask import Blueprint, jsonify, current_app, request
-from routes.auth import login_required
+from routes.auth import login_required, admin_required
+from routes.pagination import company_list_response
 import logging
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from models import Report, db, User
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, text
 from datetime import datetime, timedelta
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+def _set_statement_timeout(timeout):
+    # Transaction-local, so it ends with the source's app context and session
+    db.session.execute(text("SELECT set_config('statement_timeout', :ms, true)"),
+                       {'ms': str(int(timeout * 1000))})
+
+def _count_reports_today(timeout=None):
+    if timeout:
+        _set_statement_timeout(timeout)
+    # Range filter instead of date(created_at) so idx_reports_created_at is usable
+    today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    return db.session.query(func.count(Report.id)).filter(
+        Report.created_at >= today_start,
+        Report.created_at < today_start + timedelta(days=1)
+    ).scalar() or 0
+
+def _get_recent_reports_data(timeout=None):
+    if timeout:
+        _set_statement_timeout(timeout)
+    # Get recent reports with user info
+    recent_reports = Report.query.join(User).add_columns(
+        Report.id,
+        Report.company_name,
+        Report.status,
+        Report.created_at,
+        User.username
+    ).order_by(Report.created_at.desc()).limit(10).all()
+
+    reports_data = []
+    for report in recent_reports:
+        reports_data.append({
+            'id': report.id,
+            'company_name': report.company_name,
+            'status': report.status,
+            'created_at': report.created_at.isoformat() if report.created_at else None,
+            'username': report.username
+        })
+    return reports_data
+
+def _fan_out(sources):
+    """Run the given data sources concurrently on the dashboard executor.
+
+    sources maps a name to (callable, timeout in seconds). Each callable runs
+    inside its own app context so SQLAlchemy sessions stay thread-local, and
+    is passed its timeout so the query is also aborted server-side and frees
+    its executor thread. Returns (results, errors): sources that fail or miss
+    their timeout are reported in errors instead of failing the whole request.
+    """
+    app = current_app._get_current_object()
+    executor = app.config['dashboard_executor']
+
+    def run_in_context(source, timeout):
+        with app.app_context():
+            return source(timeout)
+
+    started = time.monotonic()
+    futures = {
+        name: (executor.submit(run_in_context, source, timeout), timeout)
+        for name, (source, timeout) in sources.items()
+    }
+
+    results = {}
+    errors = {}
+    for name, (future, timeout) in futures.items():
+        remaining = max(0.0, started + timeout - time.monotonic())
+        try:
+            results[name] = future.result(timeout=remaining)
+        except FuturesTimeoutError:
+            future.cancel()
+            logging.warning(f"Dashboard source '{name}' timed out after {timeout}s")
+            errors[name] = 'timeout'
+        except Exception as e:
+            logging.error(f"Dashboard source '{name}' failed: {str(e)}")
+            errors[name] = 'failed'
+
+    return results, errors
+
+def _dashboard_sources(include_recent_reports=False):
+    neo4j_service = current_app.config['neo4j_service']
+    timeout = current_app.config['DASHBOARD_SOURCE_TIMEOUT']
+
+    sources = {
+        # Failures must raise so they are reported in errors, not as zero counts
+        'neo4j': (lambda source_timeout: neo4j_service.get_dashboard_aggregates(
+            raise_errors=True, timeout=source_timeout), timeout),
+        'reports_today': (_count_reports_today, timeout)
+    }
+    if include_recent_reports:
+        sources['recent_reports'] = (_get_recent_reports_data, timeout)
+    return sources
+
+def _stats_payload(results):
+    aggregates = results.get('neo4j') or {}
+    return {
+        'company_count': aggregates.get('company_count'),
+        'sector_count': aggregates.get('sector_count'),
+        'reports_today': results.get('reports_today'),
+        # Get last update time (mock for now, could be from Neo4j metadata)
+        'last_update': datetime.utcnow().isoformat(),
+        'sector_distribution': aggregates.get('sector_distribution', [])
+    }
+
 @dashboard_bp.route('/stats', methods=['GET'])
 @login_required
 def get_dashboard_stats():
     try:
-        neo4j_service = current_app.config['neo4j_service']
-
-        # Get company count from Neo4j
-        company_count = neo4j_service.get_company_count()
-
-        # Get sector aggregations
-        sector_data = neo4j_service.get_sector_aggregations()
+        # Neo4j aggregates and the PostgreSQL report count are fetched concurrently
+        results, errors = _fan_out(_dashboard_sources())
+        if not results:
+            return jsonify({'error': 'Failed to fetch dashboard statistics'}), 500
 
-        # Get total sector count
-        total_sector_count = neo4j_service.get_total_sector_count()
+        payload = _stats_payload(results)
+        if errors:
+            payload['errors'] = errors
+        return jsonify(payload), 200
 
-        # Get report stats from PostgreSQL
-        
-
-        today = datetime.utcnow().date()
-        reports_today = db.session.query(func.count(Report.id)).filter(
-            func.date(Report.created_at) == today
-        ).scalar() or 0
+    except Exception as e:
+        logging.error(f"Dashboard stats error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch dashboard statistics'}), 500
 
-        # Get last update time (mock for now, could be from Neo4j metadata)
-        last_update = datetime.utcnow().isoformat()
+@dashboard_bp.route('/overview', methods=['GET'])
+@login_required
+def get_dashboard_overview():
+    """Stats and recent reports in one response, with partial results on failure"""
+    try:
+        results, errors = _fan_out(_dashboard_sources(include_recent_reports=True))
 
-        return jsonify({
-            'company_count': company_count,
-            'sector_count': total_sector_count,
-            'reports_today': reports_today,
-            'last_update': last_update,
-            'sector_distribution': sector_data
-        }), 200
+        payload = _stats_payload(results)
+        payload['recent_reports'] = results.get('recent_reports', [])
+        payload['errors'] = errors
+        payload['partial'] = bool(errors)
+        return jsonify(payload), 200
 
     except Exception as e:
-        logging.error(f"Dashboard stats error: {str(e)}")
-        return jsonify({'error': 'Failed to fetch dashboard statistics'}), 500
+        logging.error(f"Dashboard overview error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch dashboard overview'}), 500
 
 @dashboard_bp.route('/companies', methods=['GET'])
 @login_required
 def get_companies():
     try:
         neo4j_service = current_app.config['neo4j_service']
-        companies = neo4j_service.get_companies_list()
-
-        return jsonify({'companies': companies}), 200
+        return jsonify(company_list_response(neo4j_service, 'SUK')), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Get companies error: {str(e)}")
         return jsonify({'error': 'Failed to fetch companies'}), 500
@@ -63,7 +164,7 @@ def get_companies():
 def get_sectors():
     try:
         neo4j_service = current_app.config['neo4j_service']
-        sectors = neo4j_service.get_sector_aggregations()
+        sectors = neo4j_service.get_dashboard_aggregates()['sector_distribution']
 
         return jsonify({'sectors': sectors}), 200
 
@@ -75,28 +176,7 @@ def get_sectors():
 @login_required
 def get_recent_reports():
     try:
-        
-
-        # Get recent reports with user info
-        recent_reports = Report.query.join(User).add_columns(
-            Report.id,
-            Report.company_name,
-            Report.status,
-            Report.created_at,
-            User.username
-        ).order_by(Report.created_at.desc()).limit(10).all()
-
-        reports_data = []
-        for report in recent_reports:
-            reports_data.append({
-                'id': report.id,
-                'company_name': report.company_name,
-                'status': report.status,
-                'created_at': report.created_at.isoformat() if report.created_at else None,
-                'username': report.username
-            })
-
-        return jsonify({'recent_reports': reports_data}), 200
+        return jsonify({'recent_reports': _get_recent_reports_data()}), 200
 
     except Exception as e:
         logging.error(f"Get recent reports error: {str(e)}")
@@ -119,3 +199,42 @@ def get_sector_companies():
     except Exception as e:
         logging.error(f"Get sector companies error: {str(e)}")
         return jsonify({'error': 'Failed to fetch sector companies'}), 500
+
+@dashboard_bp.route('/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    try:
+        neo4j_service = current_app.config['neo4j_service']
+        return jsonify({'cache': neo4j_service.cache_stats()}), 200
+
+    except Exception as e:
+        logging.error(f"Get cache stats error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch cache statistics'}), 500
+
+@dashboard_bp.route('/cache/invalidate', methods=['POST'])
+@admin_required
+def invalidate_cache():
+    try:
+        data = request.get_json(silent=True) or {}
+        label = data.get('label')
+
+        neo4j_service = current_app.config['neo4j_service']
+        removed = neo4j_service.invalidate_cache(label)
+
+        # Chat answers are built from the same graph; FEDERTERZIARIO has no chat
+        chat_removed = 0
+        if label in (None, 'SUK', 'STARTUP'):
+            chat_removed = current_app.config['chat_cache'].invalidate(label)
+
+        return jsonify({
+            'message': 'Cache invalidated',
+            'entries_removed': removed,
+            'chat_entries_removed': chat_removed,
+            'cache': neo4j_service.cache_stats()
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Invalidate cache error: {str(e)}")
+        return jsonify({'error': 'Failed to invalidate cache'}), 500
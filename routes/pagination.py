@@ -0,0 +1,84 @@
+import base64
+import json
+
+from flask import request
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def parse_limit(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse the `limit` query parameter, clamped to maximum.
+
+    Raises ValueError when the value is not a positive integer.
+    """
+    raw_limit = request.args.get('limit')
+    if raw_limit is None or raw_limit == '':
+        return default
+
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+
+    if limit < 1:
+        raise ValueError('limit must be greater than zero')
+
+    return min(limit, maximum)
+
+
+def parse_fields():
+    """Parse the comma separated `fields` query parameter, None when absent"""
+    raw_fields = request.args.get('fields')
+    if not raw_fields:
+        return None
+
+    return [field.strip() for field in raw_fields.split(',') if field.strip()]
+
+
+def encode_cursor(*values):
+    """Opaque cursor for keyset pagination built from the last row's sort key"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor from encode_cursor into a list of `size` values.
+
+    Raises ValueError when the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def company_list_response(neo4j_service, label):
+    """Build the JSON payload for a company list endpoint.
+
+    Plain requests keep returning the full list; `limit`/`after` switch to
+    keyset pages ordered on (nome_azienda, element id) and `fields` projects
+    each company. `after` is the opaque next_after cursor of the previous page.
+    """
+    fields = parse_fields()
+    after = request.args.get('after')
+
+    if 'limit' not in request.args and not after:
+        page = neo4j_service.get_companies_page(label, fields=fields)
+        return {'companies': page['companies']}
+
+    after_key = decode_cursor(after, 2) if after else None
+    if after_key is not None and not all(isinstance(value, str) for value in after_key):
+        raise ValueError('Invalid cursor')
+
+    page = neo4j_service.get_companies_page(label, limit=parse_limit(), after=after_key, fields=fields)
+    return {
+        'companies': page['companies'],
+        'next_after': encode_cursor(*page['next_after']) if page['next_after'] else None,
+        'has_more': page['has_more']
+    }
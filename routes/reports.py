@@ -1,13 +1,24 @@
-from flask import Blueprint, request, jsonify, session, current_app, send_file
+from flask import Blueprint, request, jsonify, session, current_app, send_file, Response, stream_with_context
 from routes.auth import login_required
-from models import db, Report, User
+from routes.pagination import company_list_response, parse_limit, encode_cursor, decode_cursor
+from models import db, Report, ReportBatch, User
+from services.report_events import IN_FLIGHT_STATUSES, report_event, format_sse
+from services.report_queue import callback_token
+from services.report_storage import ReportTooLargeError, report_file_name
+import hmac
 import logging
 import os
-import requests
-from datetime import datetime
+import queue
+import time
+from urllib.parse import quote
+from datetime import date, datetime, timedelta
 
 reports_bp = Blueprint('reports', __name__)
 
+MAX_BATCH_COMPANY_NAMES = 100
+MAX_SUBGRAPH_DEPTH = 3
+MAX_BULK_REPORTS = 200
+
 
 @reports_bp.route('/generate', methods=['POST'])
 @login_required
@@ -22,6 +33,23 @@ def generate_report():
         company_name = data['company_name']
         report_type = data.get('type', 'suk')  # Default to 'suk' for backward compatibility
 
+        # Reuse a recent report for the same company and type instead of re-running the workflow
+        reuse_window = current_app.config.get('REPORT_REUSE_WINDOW', 0)
+        if reuse_window > 0 and not data.get('force'):
+            existing_report = _find_reusable_reports([company_name], report_type, reuse_window).get(company_name)
+            reused_report = _reuse_report(existing_report, user_id) if existing_report else None
+            if reused_report:
+                db.session.add(reused_report)
+                db.session.commit()
+                current_app.config['report_events'].publish_report(reused_report)
+
+                return jsonify({
+                    'message': 'Recent report reused',
+                    'report_id': reused_report.id,
+                    'status': reused_report.status,
+                    'reused_from': existing_report.id
+                }), 200
+
         # Create report record
         new_report = Report()
         new_report.user_id = user_id
@@ -30,64 +58,19 @@ def generate_report():
         new_report.status = 'pending'
 
         db.session.add(new_report)
-        db.session.commit()
-
-        # Call n8n webhook using environment variable
-        webhook_url = current_app.config.get('N8N_REPORT_WEBHOOK_URL', 'http://host.docker.internal:5678/webhook/baf08e2e-8b5b-414e-bde2-109cec9b60ab')
-        webhook_payload = {
-            "nome_azienda": company_name,
-            "type": report_type
-        }
-
-        try:
-            webhook_response = requests.post(
-                webhook_url,
-                json=webhook_payload,
-                timeout=300,
-                headers={'Content-Type': 'application/json'})
-
-            if webhook_response.status_code == 200:
-                # Check if response is binary PDF
-                content_type = webhook_response.headers.get('content-type', '')
-                if 'application/pdf' in content_type:
-                    # Direct PDF response - file is ready
-                    # Save the file
-                    if report_type == 'federterziario_filiera':
-                        current_date = datetime.now().strftime('%Y%m%d')
-                        file_name = f"Federterziario_filiera_{current_date}.pdf"
-                    else:
-                        clean_company_name = company_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
-                        current_date_extended = datetime.now().strftime('%Y%m%d%H%M')
-                        file_name = f"{clean_company_name}_{current_date_extended}.pdf"
-                    file_path = os.path.join('reports', file_name)
-
-                    with open(file_path, 'wb') as f:
-                        f.write(webhook_response.content)
-
-                    new_report.workflow_id = f"webhook_{new_report.id}"
-                    new_report.status = 'completed'
-                    new_report.file_name = file_name
-                    new_report.file_path = file_path
-                else:
-                    # Handle JSON response (processing status)
-                    new_report.workflow_id = f"webhook_{new_report.id}"
-                    new_report.status = 'processing'
-            else:
-                logging.error(
-                    f"Webhook call failed: {webhook_response.status_code}")
-                new_report.status = 'failed'
-
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Webhook request failed: {str(e)}")
-            new_report.status = 'failed'
+        db.session.flush()
 
+        # The webhook call runs on the report worker pool, not in this request
+        report_queue = current_app.config['report_queue']
+        report_queue.enqueue(new_report)
         db.session.commit()
+        report_queue.notify()
 
         return jsonify({
-            'message': 'Report generation started',
+            'message': 'Report generation queued',
             'report_id': new_report.id,
             'status': new_report.status
-        }), 200
+        }), 202
 
     except Exception as e:
         logging.error(f"Generate report error: {str(e)}")
@@ -95,6 +78,179 @@ def generate_report():
         return jsonify({'error': 'Failed to generate report'}), 500
 
 
+def _find_reusable_reports(company_names, report_type, window_seconds):
+    """Map each company to its newest completed report of report_type within the window whose file still exists"""
+    report_storage = current_app.config['report_storage']
+    since = datetime.utcnow() - timedelta(seconds=window_seconds)
+
+    candidates = Report.query.filter(
+        Report.company_name.in_(company_names),
+        Report.report_type == report_type,
+        Report.status == 'completed',
+        Report.file_path.isnot(None),
+        Report.created_at >= since
+    ).order_by(Report.created_at.desc()).all()
+
+    reusable = {}
+    for candidate in candidates:
+        if candidate.company_name not in reusable and report_storage.exists(candidate.file_path):
+            reusable[candidate.company_name] = candidate
+    return reusable
+
+
+def _reuse_report(existing_report, user_id, batch_id=None):
+    """New completed report for user_id pointing at the file of existing_report.
+
+    Returns None when the file was deleted in the meantime; the caller then
+    queues a new report instead.
+    """
+    # Touch the file before the row exists so a concurrent delete keeps it
+    if not current_app.config['report_storage'].claim(existing_report.file_path):
+        return None
+
+    reused_report = Report()
+    reused_report.user_id = user_id
+    reused_report.company_name = existing_report.company_name
+    reused_report.report_type = existing_report.report_type
+    reused_report.status = 'completed'
+    reused_report.batch_id = batch_id
+    reused_report.workflow_id = existing_report.workflow_id
+    reused_report.file_name = existing_report.file_name
+    reused_report.file_path = existing_report.file_path
+    reused_report.file_size = existing_report.file_size
+    reused_report.checksum = existing_report.checksum
+    return reused_report
+
+
+@reports_bp.route('/generate-bulk', methods=['POST'])
+@login_required
+def generate_bulk_reports():
+    try:
+        data = request.get_json() or {}
+        user_id = session['user_id']
+        report_type = data.get('type', 'suk')
+        sector = data.get('sector')
+        companies = data.get('companies')
+
+        if sector and not companies:
+            # get_companies_by_sector only covers SUK companies
+            if report_type != 'suk':
+                return jsonify({'error': 'Sector selection is only available for SUK reports'}), 400
+            neo4j_service = current_app.config['neo4j_service']
+            companies = [c['nome_azienda'] for c in neo4j_service.get_companies_by_sector(sector) if c.get('nome_azienda')]
+
+        if not companies or not isinstance(companies, list):
+            return jsonify({'error': 'A list of companies or a sector is required'}), 400
+
+        # Drop blanks and duplicates, keep the requested order
+        company_names = list(dict.fromkeys(str(name).strip() for name in companies if name and str(name).strip()))
+        if not company_names:
+            return jsonify({'error': 'A list of companies or a sector is required'}), 400
+        if len(company_names) > MAX_BULK_REPORTS:
+            return jsonify({'error': f'At most {MAX_BULK_REPORTS} companies per batch'}), 400
+
+        max_concurrency_limit = current_app.config.get('REPORT_BATCH_MAX_CONCURRENCY', 2)
+        try:
+            max_concurrency = int(data.get('max_concurrency', max_concurrency_limit))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'max_concurrency must be an integer'}), 400
+        max_concurrency = max(1, min(max_concurrency, max_concurrency_limit))
+
+        batch = ReportBatch()
+        batch.user_id = user_id
+        batch.report_type = report_type
+        batch.sector = sector
+        batch.total = len(company_names)
+        batch.max_concurrency = max_concurrency
+        db.session.add(batch)
+        db.session.flush()
+
+        reusable = {}
+        reuse_window = current_app.config.get('REPORT_REUSE_WINDOW', 0)
+        if reuse_window > 0 and not data.get('force'):
+            reusable = _find_reusable_reports(company_names, report_type, reuse_window)
+
+        new_reports = []
+        reused_reports = []
+        for company_name in company_names:
+            reused_report = _reuse_report(reusable[company_name], user_id, batch.id) if company_name in reusable else None
+            if reused_report:
+                reused_reports.append(reused_report)
+                continue
+            new_report = Report()
+            new_report.user_id = user_id
+            new_report.company_name = company_name
+            new_report.report_type = report_type
+            new_report.status = 'pending'
+            new_report.batch_id = batch.id
+            new_reports.append(new_report)
+
+        # All rows and jobs are created in one transaction
+        db.session.add_all(new_reports + reused_reports)
+        db.session.flush()
+        report_queue = current_app.config['report_queue']
+        for new_report in new_reports:
+            report_queue.enqueue(new_report)
+        db.session.commit()
+        report_queue.notify()
+
+        report_events = current_app.config['report_events']
+        for reused_report in reused_reports:
+            report_events.publish_report(reused_report)
+
+        return jsonify({
+            'message': 'Bulk report generation queued',
+            'batch': batch.to_dict(),
+            'report_ids': [r.id for r in new_reports + reused_reports],
+            'queued': len(new_reports),
+            'reused': len(reused_reports)
+        }), 202
+
+    except Exception as e:
+        logging.error(f"Generate bulk reports error: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to generate reports'}), 500
+
+
+@reports_bp.route('/batches/<int:batch_id>', methods=['GET'])
+@login_required
+def get_report_batch(batch_id):
+    try:
+        user_id = session['user_id']
+
+        batch = ReportBatch.query.filter_by(id=batch_id, user_id=user_id).first()
+        if not batch:
+            return jsonify({'error': 'Batch not found'}), 404
+
+        reports = db.session.query(Report.id, Report.company_name, Report.status, Report.error_message) \
+            .filter(Report.batch_id == batch.id).order_by(Report.id).all()
+
+        counts = {}
+        for report in reports:
+            counts[report.status] = counts.get(report.status, 0) + 1
+        finished = counts.get('completed', 0) + counts.get('failed', 0)
+
+        return jsonify({
+            'batch': batch.to_dict(),
+            'progress': {
+                'total': len(reports),
+                'finished': finished,
+                'percent': round(finished * 100 / len(reports), 1) if reports else 100.0,
+                'counts': counts
+            },
+            'reports': [{
+                'id': report.id,
+                'company_name': report.company_name,
+                'status': report.status,
+                'error_message': report.error_message
+            } for report in reports]
+        }), 200
+
+    except Exception as e:
+        logging.error(f"Get report batch error: {str(e)}")
+        return jsonify({'error': 'Failed to get batch progress'}), 500
+
+
 @reports_bp.route('/status/<int:report_id>', methods=['GET'])
 @login_required
 def get_report_status(report_id):
@@ -105,8 +261,8 @@ def get_report_status(report_id):
         if not report:
             return jsonify({'error': 'Report not found'}), 404
 
-        # Check status with n8n if workflow_id exists
-        if report.workflow_id and report.status == 'pending':
+        # Check status with n8n if workflow_id exists; with callbacks enabled n8n reports completion itself
+        if report.workflow_id and report.status == 'pending' and not current_app.config.get('N8N_CALLBACK_SECRET'):
             n8n_service = current_app.config['n8n_service']
             workflow_status = n8n_service.check_workflow_status(
                 report.workflow_id)
@@ -124,6 +280,7 @@ def get_report_status(report_id):
                     report.status = 'failed'
 
                 db.session.commit()
+                current_app.config['report_events'].publish_report(report)
 
         return jsonify({
             'report_id':
@@ -143,6 +300,191 @@ def get_report_status(report_id):
         return jsonify({'error': 'Failed to get report status'}), 500
 
 
+@reports_bp.route('/callback/<int:report_id>', methods=['POST'])
+def report_callback(report_id):
+    """Completion callback for n8n.
+
+    Authenticated with the per-report token sent in the webhook payload, passed
+    back as 'Authorization: Bearer <token>' or 'X-Callback-Token'. The body is
+    either the PDF (multipart field 'file' or a raw application/pdf body) or
+    JSON {"status": "failed", "error": "..."}.
+    """
+    try:
+        secret = current_app.config.get('N8N_CALLBACK_SECRET')
+        if not secret:
+            return jsonify({'error': 'Callbacks are not enabled'}), 404
+
+        provided_token = request.headers.get('X-Callback-Token', '')
+        authorization = request.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            provided_token = authorization[len('Bearer '):]
+        if not hmac.compare_digest(provided_token, callback_token(secret, report_id)):
+            return jsonify({'error': 'Invalid callback token'}), 401
+
+        report = Report.query.filter_by(id=report_id).first()
+        status = report.status if report else None
+        # Don't keep a transaction open while the upload streams in
+        db.session.rollback()
+        if not report:
+            return jsonify({'error': 'Report not found'}), 404
+
+        # n8n may retry a callback; the first result wins
+        if status in ('completed', 'failed'):
+            return jsonify({'report_id': report_id, 'status': status}), 200
+
+        upload = request.files.get('file')
+        if upload or request.mimetype == 'application/pdf':
+            report_storage = current_app.config['report_storage']
+            try:
+                file_path, file_size, checksum = report_storage.save_stream(upload.stream if upload else request.stream)
+            except ReportTooLargeError as e:
+                result = {'status': 'failed', 'error_message': str(e)}
+            else:
+                result = {'status': 'completed', 'file_path': file_path, 'file_size': file_size,
+                          'checksum': checksum, 'error_message': None}
+        else:
+            data = request.get_json(silent=True) or {}
+            if data.get('status') != 'failed':
+                return jsonify({'error': 'Expected a PDF or a failed status'}), 400
+            result = {'status': 'failed', 'error_message': str(data.get('error') or 'Report generation failed')[:2000]}
+
+        # Lock the row only to apply the result, so the report worker can't overwrite it concurrently.
+        # A file stored for a result that lost the race is removed by the orphan file reaping.
+        report = Report.query.filter_by(id=report_id).with_for_update().first()
+        if not report:
+            db.session.rollback()
+            return jsonify({'error': 'Report not found'}), 404
+        if report.status in ('completed', 'failed'):
+            db.session.rollback()
+            return jsonify({'report_id': report.id, 'status': report.status}), 200
+
+        for key, value in result.items():
+            setattr(report, key, value)
+        if report.status == 'completed':
+            report.file_name = report_file_name(report)
+
+        db.session.commit()
+        current_app.config['report_events'].publish_report(report)
+
+        return jsonify({'report_id': report.id, 'status': report.status}), 200
+
+    except Exception as e:
+        logging.error(f"Report callback error: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to process callback'}), 500
+
+
+@reports_bp.route('/events', methods=['GET'])
+@login_required
+def report_events():
+    """Server-Sent Events stream of status changes for all of the user's reports"""
+    user_id = session['user_id']
+    broker = current_app.config['report_events']
+    heartbeat = current_app.config.get('REPORT_EVENTS_HEARTBEAT', 15)
+    reconcile_interval = current_app.config.get('REPORT_EVENTS_RECONCILE_INTERVAL', 30)
+    max_duration = current_app.config.get('REPORT_EVENTS_MAX_DURATION', 300)
+
+    def in_flight_reports(report_ids):
+        # One query for every report the client may still be waiting on
+        condition = Report.status.in_(IN_FLIGHT_STATUSES)
+        if report_ids:
+            condition = db.or_(condition, Report.id.in_(report_ids))
+        reports = Report.query.filter(Report.user_id == user_id, condition).all()
+        # Don't hold a pooled connection for the lifetime of the stream
+        db.session.close()
+        return reports
+
+    def generate():
+        known = {}
+        # Subscribe inside the generator so the finally below always pairs with it;
+        # a response discarded before its first chunk never subscribes at all
+        subscriber = broker.subscribe(user_id)
+        try:
+            reports = in_flight_reports(None)
+            for report in reports:
+                known[report.id] = report.status
+            # The browser reconnects after 'retry' ms when the stream ends
+            yield format_sse({'reports': [report_event(r) for r in reports]}, event='snapshot', retry=5000)
+
+            started = last_reconcile = time.monotonic()
+            while time.monotonic() - started < max_duration:
+                try:
+                    event = subscriber.get(timeout=heartbeat)
+                    if known.get(event['report_id']) != event['status']:
+                        known[event['report_id']] = event['status']
+                        yield format_sse(event, event='report')
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+
+                # Catch changes published by other processes
+                if time.monotonic() - last_reconcile >= reconcile_interval:
+                    last_reconcile = time.monotonic()
+                    waiting = [rid for rid, status in known.items() if status in IN_FLIGHT_STATUSES]
+                    for report in in_flight_reports(waiting):
+                        if known.get(report.id) != report.status:
+                            known[report.id] = report.status
+                            yield format_sse(report_event(report), event='report')
+                    known = {rid: status for rid, status in known.items() if status in IN_FLIGHT_STATUSES}
+        finally:
+            broker.unsubscribe(user_id, subscriber)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _ensure_report_file(report):
+    """True when the report's file is on disk, after restoring it from its archive bundle if needed"""
+    if os.path.exists(report.file_path):
+        return True
+    if not report.archived_in:
+        return False
+
+    try:
+        current_app.config['report_archive'].restore(report.file_path, report.archived_in)
+    except Exception as e:
+        logging.error(f"Failed to restore {report.file_path} from {report.archived_in}: {str(e)}")
+        return False
+    return True
+
+
+def _serve_report_file(report, as_attachment):
+    """Send a report PDF, or hand it to the front proxy when a sendfile mode is configured"""
+    sendfile_mode = current_app.config.get('REPORTS_SENDFILE_MODE')
+    reports_dir = os.path.abspath(current_app.config['report_storage'].reports_dir)
+    file_path = os.path.abspath(report.file_path)
+    relative_path = os.path.relpath(file_path, reports_dir)
+
+    if sendfile_mode in ('x-accel', 'x-sendfile') and not relative_path.startswith('..'):
+        # The proxy streams the bytes (with Range support); the worker is released immediately
+        response = current_app.response_class(mimetype='application/pdf')
+        if sendfile_mode == 'x-accel':
+            accel_prefix = current_app.config.get('REPORTS_ACCEL_PREFIX', '/protected-reports').rstrip('/')
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix}/{quote(relative_path.replace(os.sep, '/'))}"
+        else:
+            response.headers['X-Sendfile'] = file_path
+        if report.checksum:
+            response.set_etag(report.checksum)
+    else:
+        # conditional=True answers Range and If-None-Match/If-Modified-Since requests
+        response = send_file(file_path,
+                             mimetype='application/pdf',
+                             as_attachment=as_attachment,
+                             download_name=report.file_name,
+                             conditional=True,
+                             etag=report.checksum or True,
+                             max_age=current_app.config.get('REPORTS_CACHE_MAX_AGE', 3600))
+    # Reports are per user: browsers may cache them, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+
+    if as_attachment:
+        response.headers['Content-Disposition'] = f'attachment; filename="{report.file_name}"'
+    return response
+
+
 @reports_bp.route('/download/<int:report_id>', methods=['GET'])
 @login_required
 def download_report(report_id):
@@ -156,16 +498,11 @@ def download_report(report_id):
         if report.status != 'completed' or not report.file_path:
             return jsonify({'error': 'Report not ready for download'}), 400
 
-        # Check if file exists
-        if not os.path.exists(report.file_path):
+        # Check if file exists, restoring it from the archive if it was moved to cold storage
+        if not _ensure_report_file(report):
             return jsonify({'error': 'Report file not found'}), 404
 
-        response = send_file(report.file_path,
-                         as_attachment=True,
-                         download_name=report.file_name,
-                         mimetype='application/pdf')
-        response.headers['Content-Disposition'] = f'attachment; filename="{report.file_name}"'
-        return response
+        return _serve_report_file(report, as_attachment=True)
 
     except Exception as e:
         logging.error(f"Download report error: {str(e)}")
@@ -185,36 +522,123 @@ def view_report(report_id):
         if report.status != 'completed' or not report.file_path:
             return jsonify({'error': 'Report not ready for viewing'}), 400
 
-        # Check if file exists
-        if not os.path.exists(report.file_path):
+        # Check if file exists, restoring it from the archive if it was moved to cold storage
+        if not _ensure_report_file(report):
             return jsonify({'error': 'Report file not found'}), 404
 
-        return send_file(report.file_path, mimetype='application/pdf')
+        return _serve_report_file(report, as_attachment=False)
 
     except Exception as e:
         logging.error(f"View report error: {str(e)}")
         return jsonify({'error': 'Failed to view report'}), 500
 
 
+def _parse_history_date(name):
+    """Parse an ISO date or datetime query parameter into (datetime, has_time)"""
+    raw_value = request.args.get(name)
+    if not raw_value:
+        return None, False
+    try:
+        return datetime.combine(date.fromisoformat(raw_value), datetime.min.time()), False
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(raw_value), True
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO date or datetime')
+
+
+def _escape_like(value):
+    """Escape LIKE wildcards so value matches literally (use with escape='\\')"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
 @reports_bp.route('/history', methods=['GET'])
 @login_required
 def get_report_history():
+    """List the user's reports, newest first.
+
+    Filters: type and status (comma separated), company (case-insensitive
+    substring), from/to (ISO dates on created_at). Plain requests return every
+    match; `limit`/`cursor` switch to keyset pages on (created_at, id) and
+    `include_total=true` adds the number of matching reports.
+    """
     try:
         user_id = session['user_id']
         report_type = request.args.get('type')  # Optional filter by report type
+        status = request.args.get('status')
+        company = request.args.get('company')
+        created_from, _ = _parse_history_date('from')
+        created_to, to_has_time = _parse_history_date('to')
+        cursor = request.args.get('cursor')
+        paginated = 'limit' in request.args or cursor is not None
 
-        query = Report.query.filter_by(user_id=user_id)
+        query = Report.query.filter(Report.user_id == user_id)
 
         # Add type filter if specified
         if report_type:
-            query = query.filter_by(report_type=report_type)
-
-        reports = query.order_by(Report.created_at.desc()).all()
-
-        reports_data = [report.to_dict() for report in reports]
-
-        return jsonify({'reports': reports_data}), 200
+            report_types = [t.strip() for t in report_type.split(',') if t.strip()]
+            query = query.filter(Report.report_type.in_(report_types))
+        if status:
+            statuses = [s.strip() for s in status.split(',') if s.strip()]
+            query = query.filter(Report.status.in_(statuses))
+        if company:
+            query = query.filter(Report.company_name.ilike(f"%{_escape_like(company.strip())}%", escape='\\'))
+        if created_from:
+            query = query.filter(Report.created_at >= created_from)
+        if created_to:
+            # A bare date includes the whole day
+            if not to_has_time:
+                created_to = created_to + timedelta(days=1)
+                query = query.filter(Report.created_at < created_to)
+            else:
+                query = query.filter(Report.created_at <= created_to)
+
+        total = query.count() if request.args.get('include_total', '').lower() == 'true' else None
+
+        query = query.order_by(Report.created_at.desc(), Report.id.desc())
+
+        if not paginated:
+            reports = query.all()
+            response = {'reports': [report.to_dict() for report in reports]}
+            if total is not None:
+                response['total'] = total
+            return jsonify(response), 200
+
+        limit = parse_limit()
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor, 2)
+            try:
+                cursor_created_at = datetime.fromisoformat(cursor_created_at)
+                cursor_id = int(cursor_id)
+            except (TypeError, ValueError):
+                raise ValueError('Invalid cursor')
+            query = query.filter(db.or_(
+                Report.created_at < cursor_created_at,
+                db.and_(Report.created_at == cursor_created_at, Report.id < cursor_id)
+            ))
+
+        # One extra row tells whether another page exists
+        reports = query.limit(limit + 1).all()
+        has_more = len(reports) > limit
+        reports = reports[:limit]
+
+        next_cursor = None
+        if has_more:
+            last_report = reports[-1]
+            next_cursor = encode_cursor(last_report.created_at.isoformat(), last_report.id)
+
+        response = {
+            'reports': [report.to_dict() for report in reports],
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
+        if total is not None:
+            response['total'] = total
+        return jsonify(response), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Get report history error: {str(e)}")
         return jsonify({'error': 'Failed to get report history'}), 500
@@ -225,10 +649,10 @@ def get_report_history():
 def get_companies_for_reports():
     try:
         neo4j_service = current_app.config['neo4j_service']
-        companies = neo4j_service.get_companies_list()
-
-        return jsonify({'companies': companies}), 200
+        return jsonify(company_list_response(neo4j_service, 'SUK')), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Get companies for reports error: {str(e)}")
         return jsonify({'error': 'Failed to fetch companies'}), 500
@@ -239,15 +663,41 @@ def get_companies_for_reports():
 def get_federterziario_companies_for_reports():
     try:
         neo4j_service = current_app.config['neo4j_service']
-        companies = neo4j_service.get_federterziario_companies_list()
-
-        return jsonify({'companies': companies}), 200
+        return jsonify(company_list_response(neo4j_service, 'FEDERTERZIARIO')), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Get FEDERTERZIARIO companies for reports error: {str(e)}")
         return jsonify({'error': 'Failed to fetch FEDERTERZIARIO companies'}), 500
 
 
+@reports_bp.route('/federterziario-companies/search', methods=['GET'])
+@login_required
+def search_federterziario_companies():
+    """Search FEDERTERZIARIO companies by name, sector and description"""
+    try:
+        neo4j_service = current_app.config['neo4j_service']
+        search_term = request.args.get('term', '')
+        if not search_term:
+            return jsonify({
+                'success': False,
+                'error': 'Search term is required'
+            }), 400
+
+        companies = neo4j_service.search_federterziario_companies(search_term)
+        return jsonify({
+            'success': True,
+            'companies': companies
+        })
+    except Exception as e:
+        logging.error(f"Error searching FEDERTERZIARIO companies: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @reports_bp.route('/federterziario-company-details/<company_name>', methods=['GET'])
 @login_required
 def get_federterziario_company_details(company_name):
@@ -265,6 +715,39 @@ def get_federterziario_company_details(company_name):
         return jsonify({'error': 'Failed to fetch company details'}), 500
 
 
+@reports_bp.route('/company-details/batch', methods=['POST'])
+@login_required
+def get_company_details_batch():
+    """Resolve several companies of one label in a single round trip"""
+    try:
+        data = request.get_json()
+
+        if not data or not isinstance(data.get('names'), list) or not data['names']:
+            return jsonify({'error': 'A non-empty list of company names is required'}), 400
+
+        names = data['names']
+        if len(names) > MAX_BATCH_COMPANY_NAMES:
+            return jsonify({'error': f'At most {MAX_BATCH_COMPANY_NAMES} company names per request'}), 400
+        if not all(isinstance(name, str) and name for name in names):
+            return jsonify({'error': 'Company names must be non-empty strings'}), 400
+
+        label = str(data.get('label', 'suk')).upper()
+
+        neo4j_service = current_app.config['neo4j_service']
+        companies = neo4j_service.get_companies_details_batch(label, names)
+
+        return jsonify({
+            'companies': companies,
+            'not_found': [name for name, details in companies.items() if details is None]
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Get company details batch error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch company details'}), 500
+
+
 @reports_bp.route('/relationships/<company_name>', methods=['GET'])
 @login_required
 def get_company_relationships(company_name):
@@ -279,6 +762,48 @@ def get_company_relationships(company_name):
         return jsonify({'error': 'Failed to fetch company relationships'}), 500
 
 
+def _bounded_int_arg(name, default, minimum, maximum):
+    """Read an integer query parameter clamped to [minimum, maximum]"""
+    raw_value = request.args.get(name)
+    if raw_value is None or raw_value == '':
+        return default
+    try:
+        value = int(raw_value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    return max(minimum, min(value, maximum))
+
+
+@reports_bp.route('/subgraph/<label>/<company_name>', methods=['GET'])
+@login_required
+def get_company_subgraph(label, company_name):
+    """Bounded multi-hop relationship graph around a company for the network view"""
+    try:
+        depth = _bounded_int_arg('depth', 1, 1, MAX_SUBGRAPH_DEPTH)
+        min_weight = _bounded_int_arg('min_weight', 3, 0, 100)
+        max_edges_per_node = _bounded_int_arg('limit', 50, 1, 200)
+        max_nodes = _bounded_int_arg('max_nodes', 200, 1, 1000)
+        types = [t.strip() for t in request.args.get('types', '').split(',') if t.strip()]
+
+        neo4j_service = current_app.config['neo4j_service']
+        subgraph = neo4j_service.get_company_subgraph(
+            label.upper(), company_name,
+            depth=depth,
+            min_weight=min_weight,
+            max_edges_per_node=max_edges_per_node,
+            relationship_types=types or None,
+            max_nodes=max_nodes
+        )
+
+        return jsonify({'relationships': subgraph}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Get company subgraph error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch company subgraph'}), 500
+
+
 @reports_bp.route('/federterziario-relationships/<company_name>', methods=['GET'])
 @login_required
 def get_federterziario_company_relationships(company_name):
@@ -302,33 +827,30 @@ def bulk_delete_reports():
         if not data or not data.get('report_ids'):
             return jsonify({'error': 'Report IDs are required'}), 400
 
-        report_ids = data['report_ids']
+        try:
+            report_ids = {int(report_id) for report_id in data['report_ids']}
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Report IDs must be integers'}), 400
         user_id = session['user_id']
 
-        # Verify all reports belong to the current user
-        reports = Report.query.filter(
-            Report.id.in_(report_ids),
-            Report.user_id == user_id
+        # One DELETE ... RETURNING for the whole selection
+        deleted = db.session.execute(
+            db.delete(Report)
+            .where(Report.id.in_(report_ids), Report.user_id == user_id)
+            .returning(Report.id, Report.file_path),
+            execution_options={'synchronize_session': False}
         ).all()
 
-        if len(reports) != len(report_ids):
+        # Verify all reports belong to the current user
+        if len(deleted) != len(report_ids):
+            db.session.rollback()
             return jsonify({'error': 'Some reports not found or access denied'}), 404
 
-        deleted_count = 0
-
-        for report in reports:
-            # Delete physical file if exists
-            if report.file_path and os.path.exists(report.file_path):
-                try:
-                    os.remove(report.file_path)
-                except Exception as e:
-                    logging.warning(f"Failed to delete file {report.file_path}: {str(e)}")
-
-            # Delete from database
-            db.session.delete(report)
-            deleted_count += 1
-
         db.session.commit()
+        deleted_count = len(deleted)
+
+        # Files can be shared by reused reports; the reaper removes those nothing points to anymore
+        current_app.config['file_reaper'].submit({row.file_path for row in deleted if row.file_path})
 
         return jsonify({
             'message': f'Successfully deleted {deleted_count} reports',
@@ -343,7 +865,7 @@ def bulk_delete_reports():
 @reports_bp.route('/companies/search', methods=['GET'])
 @login_required
 def search_companies():
-    """Search companies by name"""
+    """Search companies by name, sector and description"""
     try:
         neo4j_service = current_app.config['neo4j_service']
         search_term = request.args.get('term', '')
@@ -371,10 +893,10 @@ def search_companies():
 def get_startup_companies_for_reports():
     try:
         neo4j_service = current_app.config['neo4j_service']
-        companies = neo4j_service.get_startup_companies_list()
-
-        return jsonify({'companies': companies}), 200
+        return jsonify(company_list_response(neo4j_service, 'STARTUP')), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Get STARTUP companies for reports error: {str(e)}")
         return jsonify({'error': 'Failed to fetch STARTUP companies'}), 500
@@ -383,7 +905,7 @@ def get_startup_companies_for_reports():
 @reports_bp.route('/startup-companies/search', methods=['GET'])
 @login_required
 def search_startup_companies():
-    """Search STARTUP companies by name"""
+    """Search STARTUP companies by name, activity and description"""
     try:
         neo4j_service = current_app.config['neo4j_service']
         search_term = request.args.get('term', '')
@@ -0,0 +1,70 @@
+import re
+import threading
+import unicodedata
+
+from services.cache_service import TTLCache
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_chat_query(text):
+    """Normalize free text so trivially different phrasings share a cache entry"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+class ChatAnswerCache:
+    """Caches normalized n8n chat answers for repeated questions.
+
+    Entries are keyed on (chat_type, normalized message, region, province)
+    and bounded by a TTL and an LRU size limit shared by every chat type.
+    Caching can be switched on per chat type; lookups for disabled types are
+    not counted.
+    """
+
+    def __init__(self, enabled_types, ttl=3600, max_entries=512):
+        self.enabled_types = set(enabled_types)
+        self.cache = TTLCache(max_entries=max_entries, default_ttl=ttl)
+        self._lock = threading.Lock()
+        self._lookups = {chat_type: {'hits': 0, 'misses': 0} for chat_type in self.enabled_types}
+
+    def enabled(self, chat_type):
+        return chat_type in self.enabled_types
+
+    @staticmethod
+    def key(chat_type, message, region='', province=''):
+        return (chat_type, normalize_chat_query(message), normalize_chat_query(region), normalize_chat_query(province))
+
+    def get(self, chat_type, message, region='', province=''):
+        """Return the cached answer, or None on a miss or when caching is off for chat_type"""
+        if not self.enabled(chat_type):
+            return None
+
+        found, answer = self.cache.get(self.key(chat_type, message, region, province))
+        with self._lock:
+            self._lookups[chat_type]['hits' if found else 'misses'] += 1
+        return answer if found else None
+
+    def set(self, chat_type, message, answer, region='', province=''):
+        if self.enabled(chat_type):
+            self.cache.set(self.key(chat_type, message, region, province), answer)
+
+    def invalidate(self, chat_type=None):
+        """Drop every answer, or only those of one chat type"""
+        if chat_type is None:
+            return self.cache.invalidate()
+        return self.cache.invalidate(lambda key: key[0] == chat_type)
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats['ttl'] = self.cache.default_ttl
+        with self._lock:
+            by_type = {}
+            for chat_type, counts in self._lookups.items():
+                lookups = counts['hits'] + counts['misses']
+                by_type[chat_type] = {
+                    **counts,
+                    'hit_rate': round(counts['hits'] / lookups, 4) if lookups else 0.0
+                }
+        stats['by_type'] = by_type
+        return stats
@@ -0,0 +1,70 @@
+import heapq
+import json
+import math
+
+# Ranked result lists returned by the n8n chat workflows
+RANKED_RESULT_KEYS = ('prodotti_soluzioni_esistenti', 'potenziali_fornitori')
+DEFAULT_TOP_K = 10
+
+
+def ranking_key(item):
+    """Sort key for a ranked result; missing rankings count as 0, invalid ones sort last"""
+    if not isinstance(item, dict):
+        return float('-inf')
+    try:
+        ranking = float(item.get('ranking', 0))
+    except (TypeError, ValueError):
+        return float('-inf')
+    return float('-inf') if math.isnan(ranking) else ranking
+
+
+def top_ranked(items, k=DEFAULT_TOP_K):
+    """Return the k highest ranked items, highest first.
+
+    heapq.nlargest keeps a k-sized heap instead of sorting the whole list and
+    returns the same order as sorted(..., reverse=True)[:k], ties included.
+    """
+    if not isinstance(items, list) or k <= 0:
+        return []
+    return heapq.nlargest(k, items, key=ranking_key)
+
+
+def _extract_results(item):
+    """Return the dict holding the ranked lists: the parsed `output` field if usable, else item"""
+    if 'output' not in item:
+        return item
+
+    output = item['output']
+    if isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except json.JSONDecodeError:
+            return item
+    return output if isinstance(output, dict) else item
+
+
+def normalize_chat_response(webhook_data, top_k=DEFAULT_TOP_K):
+    """Normalize an n8n chat webhook response.
+
+    Accepts a dict or a list whose first item is used, with the ranked lists
+    either at the top level or inside an `output` field (object or JSON
+    string). Returns (formatted_response, recognized); unrecognized shapes
+    get empty lists and an error message.
+    """
+    if isinstance(webhook_data, list):
+        webhook_data = webhook_data[0] if webhook_data else None
+
+    if not isinstance(webhook_data, dict):
+        return {
+            'prodotti_soluzioni_esistenti': [],
+            'potenziali_fornitori': [],
+            'timestamp': None,
+            'success': True,
+            'error': 'Unexpected response format'
+        }, False
+
+    results = _extract_results(webhook_data)
+    formatted_response = {key: top_ranked(results.get(key, []), top_k) for key in RANKED_RESULT_KEYS}
+    formatted_response['timestamp'] = webhook_data.get('timestamp')
+    formatted_response['success'] = True
+    return formatted_response, True
@@ -0,0 +1,156 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import bindparam, select, text
+
+from models import db, ChatMessage, Conversation
+
+CUSTOM_TITLE_PREFIX = 'CUSTOM_TITLE:'
+RESTORED_TITLE = 'Conversazione ripristinata dalla cronologia'
+# Postgres advisory lock key so concurrent app processes do not backfill the same messages
+BACKFILL_LOCK_KEY = 72390215
+
+
+def default_title(content):
+    """Conversation title derived from its first user message"""
+    return content[:50] + ('...' if len(content) > 50 else '')
+
+
+def split_custom_title(content):
+    """Split legacy 'CUSTOM_TITLE:<title>|<content>' messages into (title, content)"""
+    if content.startswith(CUSTOM_TITLE_PREFIX):
+        parts = content.split('|', 1)
+        if len(parts) > 1:
+            return parts[0][len(CUSTOM_TITLE_PREFIX):], parts[1]
+    return None, content
+
+
+def get_conversation(conversation_id, user_id, chat_type):
+    """Return the user's conversation, or None when it does not exist or belongs to someone else"""
+    try:
+        conversation_id = int(conversation_id)
+    except (TypeError, ValueError):
+        return None
+    return Conversation.query.filter_by(id=conversation_id, user_id=str(user_id), chat_type=chat_type).first()
+
+
+def start_conversation(user_id, chat_type, first_message):
+    """Create a conversation titled after its first message; the caller commits"""
+    now = datetime.utcnow()
+    conversation = Conversation(
+        user_id=str(user_id),
+        chat_type=chat_type,
+        title=default_title(first_message),
+        message_count=0,
+        created_at=now,
+        last_activity=now
+    )
+    db.session.add(conversation)
+    db.session.flush()
+    return conversation
+
+
+def add_chat_message(conversation, content, message_type):
+    """Add a message to a conversation and bump its counters; the caller commits"""
+    message = ChatMessage(
+        content=content,
+        message_type=message_type,
+        user_id=conversation.user_id,
+        chat_type=conversation.chat_type,
+        conversation_id=conversation.id,
+        timestamp=datetime.utcnow()
+    )
+    db.session.add(message)
+    # Incremented in SQL so concurrent requests on the same conversation do not lose counts
+    db.session.execute(
+        db.update(Conversation)
+        .where(Conversation.id == conversation.id)
+        .values(message_count=Conversation.message_count + 1, last_activity=message.timestamp),
+        execution_options={'synchronize_session': False}
+    )
+    return message
+
+
+def backfill_conversations(conn, batch_size=1000):
+    """Group chat messages saved without a conversation into conversations.
+
+    Matches the old sidebar grouping: a user message opens a conversation and
+    the assistant messages after it join that conversation. Assistant messages
+    with no user message before them get a restored conversation of their own.
+    Legacy CUSTOM_TITLE: prefixes become the conversation title. Returns the
+    number of conversations created.
+    """
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': BACKFILL_LOCK_KEY})
+
+    conversations = Conversation.__table__
+    messages = ChatMessage.__table__
+    created = 0
+    current = None
+
+    while True:
+        rows = conn.execute(
+            select(messages.c.id, messages.c.user_id, messages.c.chat_type, messages.c.message_type,
+                   messages.c.content, messages.c.timestamp)
+            .where(messages.c.conversation_id.is_(None))
+            .order_by(messages.c.user_id, messages.c.chat_type, messages.c.timestamp, messages.c.id)
+            .limit(batch_size)
+        ).fetchall()
+        if not rows:
+            break
+
+        assignments = []
+        stripped = []
+        finished = []
+        for row in rows:
+            key = (row.user_id, row.chat_type)
+            starts_conversation = row.message_type == 'user' or current is None or current['key'] != key
+            if starts_conversation:
+                if current:
+                    finished.append(current)
+                title = RESTORED_TITLE
+                if row.message_type == 'user':
+                    custom_title, content = split_custom_title(row.content)
+                    title = custom_title or default_title(content)
+                    if custom_title:
+                        stripped.append({'message_id': row.id, 'content': content})
+                conversation_id = conn.execute(conversations.insert().values(
+                    user_id=row.user_id,
+                    chat_type=row.chat_type,
+                    title=title[:255],
+                    message_count=0,
+                    created_at=row.timestamp,
+                    last_activity=row.timestamp
+                )).inserted_primary_key[0]
+                current = {'id': conversation_id, 'key': key, 'count': 0, 'last_activity': row.timestamp}
+                created += 1
+
+            current['count'] += 1
+            current['last_activity'] = row.timestamp
+            assignments.append({'message_id': row.id, 'conversation_id': current['id']})
+
+        conn.execute(
+            messages.update().where(messages.c.id == bindparam('message_id'))
+            .values(conversation_id=bindparam('conversation_id')),
+            assignments
+        )
+        if stripped:
+            conn.execute(
+                messages.update().where(messages.c.id == bindparam('message_id')).values(content=bindparam('content')),
+                stripped
+            )
+        # The current conversation may continue in the next batch
+        _write_counters(conn, finished + [current])
+
+    if created:
+        logging.info(f"Backfilled {created} chat conversations")
+    return created
+
+
+def _write_counters(conn, entries):
+    conversations = Conversation.__table__
+    conn.execute(
+        conversations.update().where(conversations.c.id == bindparam('conversation_id'))
+        .values(message_count=bindparam('count'), last_activity=bindparam('last')),
+        [{'conversation_id': entry['id'], 'count': entry['count'], 'last': entry['last_activity']} for entry in entries]
+    )
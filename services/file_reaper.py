@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from models import db, Report
+
+
+class FileReaper:
+    """Deletes report files in the background after their rows are gone.
+
+    Paths are queued by the request that deleted the rows and unlinked in
+    batches by a daemon thread. Each batch re-checks that no report points to
+    the file any more, since a reused report may have picked it up meanwhile.
+    Files that ReportStorage reused after they were queued are kept as well,
+    as their report may not be committed yet. Failed unlinks are retried with
+    a growing delay up to max_attempts; files left behind by a crash are
+    picked up by the orphan sweep.
+    """
+
+    def __init__(self, storage, batch_size=100, interval=2, max_attempts=5, retry_delay=30):
+        self.storage = storage
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.app = None
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.deleted = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        self.app = app
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='file-reaper', daemon=True)
+        self._thread.start()
+
+    def submit(self, file_paths):
+        """Queue file paths for deletion once nothing references them"""
+        with self._lock:
+            for file_path in file_paths:
+                if file_path:
+                    self._pending.append((file_path, 0, 0.0, time.time()))
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                while self.reap_batch():
+                    pass
+            except Exception as e:
+                logging.error(f"File reaper error: {str(e)}")
+
+    def _take_batch(self):
+        now = time.monotonic()
+        batch = []
+        with self._lock:
+            for _ in range(len(self._pending)):
+                if len(batch) >= self.batch_size:
+                    break
+                entry = self._pending.popleft()
+                if entry[2] > now:
+                    # Not due for a retry yet
+                    self._pending.append(entry)
+                    continue
+                batch.append(entry)
+        return batch
+
+    def reap_batch(self):
+        """Delete one batch of due files; returns the number of paths handled"""
+        batch = self._take_batch()
+        if not batch:
+            return 0
+
+        paths = {entry[0] for entry in batch}
+        with self.app.app_context():
+            still_referenced = {
+                row.file_path for row in db.session.query(Report.file_path)
+                .filter(Report.file_path.in_(paths)).distinct()
+            }
+            db.session.close()
+
+        retries = []
+        for file_path, attempts, _, queued_at in batch:
+            if file_path in still_referenced:
+                self.skipped += 1
+                continue
+            deleted = self.storage.delete_if_untouched(file_path, since=queued_at)
+            if deleted is None:
+                # Reused by a report that is still being saved
+                self.skipped += 1
+                continue
+            if deleted:
+                self.deleted += 1
+                continue
+            attempts += 1
+            if attempts < self.max_attempts:
+                retries.append((file_path, attempts, time.monotonic() + self.retry_delay * attempts, queued_at))
+            else:
+                self.failed += 1
+                logging.error(f"Giving up deleting {file_path} after {attempts} attempts")
+
+        if retries:
+            with self._lock:
+                self._pending.extend(retries)
+        return len(batch)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'deleted': self.deleted,
+            'skipped': self.skipped,
+            'failed': self.failed
+        }
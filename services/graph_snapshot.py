@@ -0,0 +1,210 @@
+import logging
+import threading
+import time
+from array import array
+from collections import deque
+
+
+class LabelGraph:
+    """Compact adjacency (CSR) of the relationships between companies of one label.
+
+    Company names are interned to integer ids; the outgoing edges of company i
+    live at positions offsets[i]:offsets[i + 1] of the parallel edge arrays,
+    sorted by weight descending so top-N selection is a slice.
+    """
+
+    def __init__(self, edges):
+        names = []
+        ids = {}
+        types = []
+        type_ids = {}
+        adjacency = {}
+
+        def intern(name):
+            company_id = ids.get(name)
+            if company_id is None:
+                company_id = ids[name] = len(names)
+                names.append(name)
+            return company_id
+
+        for source, target, rel_type, weight, properties in edges:
+            type_id = type_ids.get(rel_type)
+            if type_id is None:
+                type_id = type_ids[rel_type] = len(types)
+                types.append(rel_type)
+            source_id = intern(source)
+            target_id = intern(target)
+            adjacency.setdefault(source_id, []).append((weight, target_id, type_id, properties))
+
+        self.names = names
+        self.ids = ids
+        self.types = types
+        self.type_ids = type_ids
+        self.offsets = array('l', [0] * (len(names) + 1))
+        self.targets = array('l')
+        self.weights = array('d')
+        self.edge_types = array('l')
+        self.properties = []
+
+        for company_id in range(len(names)):
+            outgoing = adjacency.get(company_id, ())
+            for weight, target_id, type_id, properties in sorted(outgoing, key=lambda e: e[0], reverse=True):
+                self.targets.append(target_id)
+                self.weights.append(weight)
+                self.edge_types.append(type_id)
+                self.properties.append(properties)
+            self.offsets[company_id + 1] = len(self.targets)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def subgraph(self, company_name, depth, min_weight, max_edges_per_node, types, max_nodes):
+        """Same contract as Neo4jService.get_company_subgraph, answered from memory"""
+        center = self.ids.get(company_name)
+        if center is None:
+            return {'nodes': [], 'edges': [], 'truncated': False}
+
+        allowed_types = None
+        if types:
+            allowed_types = {self.type_ids[t] for t in types if t in self.type_ids}
+
+        node_depths = {center: 0}
+        edges = []
+        seen_edges = set()
+        truncated = False
+        queue = deque([center])
+
+        while queue:
+            source = queue.popleft()
+            hop = node_depths[source]
+            if hop >= depth:
+                continue
+
+            taken = 0
+            for position in range(self.offsets[source], self.offsets[source + 1]):
+                weight = self.weights[position]
+                # Edges are sorted by weight, nothing lighter can qualify
+                if weight < min_weight or taken >= max_edges_per_node:
+                    break
+                type_id = self.edge_types[position]
+                if allowed_types is not None and type_id not in allowed_types:
+                    continue
+                taken += 1
+
+                target = self.targets[position]
+                if target not in node_depths:
+                    if len(node_depths) >= max_nodes:
+                        truncated = True
+                        continue
+                    node_depths[target] = hop + 1
+                    queue.append(target)
+
+                edge_key = (source, target, type_id)
+                if edge_key in seen_edges:
+                    continue
+                seen_edges.add(edge_key)
+
+                # Aggiungi il tipo alle proprietà della relazione
+                rel_type = self.types[type_id]
+                rel_props = dict(self.properties[position] or {})
+                rel_props['type'] = rel_type
+                edges.append({
+                    'source': self.names[source],
+                    'target': self.names[target],
+                    'weight': rel_props.get('weight', weight),
+                    'type': rel_type,
+                    'properties': rel_props
+                })
+
+        if not edges:
+            return {'nodes': [], 'edges': [], 'truncated': False}
+
+        nodes = [{
+            'id': self.names[company_id],
+            'name': self.names[company_id],
+            'type': 'center' if company_id == center else 'related',
+            'depth': hop
+        } for company_id, hop in node_depths.items()]
+
+        return {'nodes': nodes, 'edges': edges, 'truncated': truncated}
+
+
+class GraphSnapshot:
+    """Process-local snapshot of company relationships, refreshed in the background"""
+
+    def __init__(self, neo4j_service, labels, refresh_interval=300, max_age=900):
+        self.neo4j_service = neo4j_service
+        self.labels = tuple(labels)
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self._graphs = {}
+        self._loaded_at = {}
+        self._generations = {label: 0 for label in self.labels}
+        self._refresh_requested = threading.Event()
+        self._thread = None
+        self.refresh_failures = 0
+
+    def start(self):
+        """Load the snapshot in a daemon thread and keep it refreshed"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='graph-snapshot', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            self._refresh_requested.wait(self.refresh_interval)
+            self._refresh_requested.clear()
+
+    def request_refresh(self, labels=None):
+        """Mark labels stale so lookups fall back to Neo4j until the next reload"""
+        for label in labels or self.labels:
+            self._generations[label] += 1
+            self._loaded_at.pop(label, None)
+        self._refresh_requested.set()
+
+    def refresh(self, labels=None):
+        """Reload the given labels (default all); a failed reload keeps the old graph"""
+        for label in labels or self.labels:
+            started = time.monotonic()
+            generation = self._generations[label]
+            try:
+                edges = self.neo4j_service.get_relationship_edges(label)
+                graph = LabelGraph(edges)
+            except Exception as e:
+                self.refresh_failures += 1
+                logging.error(f"Error refreshing {label} graph snapshot: {str(e)}")
+                continue
+
+            # Data read before a refresh request may already be outdated
+            if generation != self._generations[label]:
+                continue
+
+            # Swap in the new graph with a single assignment
+            self._graphs[label] = graph
+            self._loaded_at[label] = time.monotonic()
+            logging.info(f"{label} graph snapshot loaded: {len(graph.names)} companies, "
+                         f"{graph.edge_count} relationships in {time.monotonic() - started:.2f}s")
+
+    def get(self, label):
+        """Return the LabelGraph for label, or None when missing or older than max_age"""
+        loaded_at = self._loaded_at.get(label)
+        if loaded_at is None or time.monotonic() - loaded_at > self.max_age:
+            return None
+        return self._graphs.get(label)
+
+    def stats(self):
+        now = time.monotonic()
+        stats = {'refresh_failures': self.refresh_failures, 'labels': {}}
+        for label in self.labels:
+            graph = self._graphs.get(label)
+            loaded_at = self._loaded_at.get(label)
+            stats['labels'][label] = {
+                'companies': len(graph.names) if graph else 0,
+                'relationships': graph.edge_count if graph else 0,
+                'age_seconds': round(now - loaded_at, 1) if loaded_at is not None else None,
+                'fresh': self.get(label) is not None
+            }
+        return stats
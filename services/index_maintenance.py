@@ -0,0 +1,106 @@
+import logging
+
+from sqlalchemy import text
+
+# Postgres advisory lock key so only one process builds indexes at a time
+INDEX_BUILD_LOCK_KEY = 72390216
+
+# Composite indexes for the chat queries, built online with CREATE INDEX CONCURRENTLY
+CHAT_MESSAGE_INDEXES = {
+    # Per-user history and backfill scans: user_id = ? AND chat_type = ? ORDER BY timestamp, id
+    'idx_chat_messages_user_type_timestamp': 'chat_messages (user_id, chat_type, timestamp, id)',
+    # Messages of a conversation page in order; also serves the conversations ON DELETE CASCADE
+    'idx_chat_messages_conversation_timestamp': 'chat_messages (conversation_id, timestamp, id)',
+}
+
+# Indexes superseded by the composites above, dropped once those are valid
+SUPERSEDED_INDEXES = {
+    'ix_chat_messages_conversation_id': 'idx_chat_messages_conversation_timestamp',
+}
+
+
+def _index_state(conn, name):
+    """Return None when the index does not exist, otherwise whether it is valid"""
+    return conn.execute(text("""
+        SELECT i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name
+    """), {'name': name}).scalar()
+
+
+def ensure_indexes_concurrently(engine, indexes=CHAT_MESSAGE_INDEXES, superseded=SUPERSEDED_INDEXES):
+    """Create missing indexes without blocking writes to their tables.
+
+    CREATE INDEX CONCURRENTLY cannot run inside a transaction, so this uses
+    an AUTOCOMMIT connection. A build that failed or was interrupted leaves
+    an INVALID index behind that IF NOT EXISTS would keep skipping; those
+    are dropped and rebuilt. Returns {name: 'present'|'created'|'rebuilt'|'failed'},
+    or None when another process holds the build lock or the database is
+    not PostgreSQL.
+    """
+    if engine.dialect.name != 'postgresql':
+        return None
+
+    results = {}
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': INDEX_BUILD_LOCK_KEY}).scalar():
+            logging.info("Index build already running in another process")
+            return None
+
+        try:
+            for name, definition in indexes.items():
+                state = _index_state(conn, name)
+                if state:
+                    results[name] = 'present'
+                    continue
+
+                try:
+                    if state is False:
+                        logging.warning(f"Dropping invalid index {name} before rebuilding it")
+                        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                    logging.info(f"Creating index {name} concurrently...")
+                    conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+                    results[name] = 'rebuilt' if state is False else 'created'
+                except Exception as e:
+                    logging.error(f"Failed to create index {name}: {str(e)}")
+                    results[name] = 'failed'
+
+            for name, replacement in superseded.items():
+                if _index_state(conn, replacement) and _index_state(conn, name) is not None:
+                    logging.info(f"Dropping index {name}, superseded by {replacement}")
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': INDEX_BUILD_LOCK_KEY})
+
+    return results
+
+
+def index_usage_report(conn, tables=('chat_messages', 'conversations')):
+    """Scan counts per index and per table since the statistics were last reset.
+
+    An index with idx_scan = 0 after normal traffic is unused; a table whose
+    seq_scan keeps growing next to large seq_tup_read still has queries that
+    no index serves.
+    """
+    indexes = conn.execute(text("""
+        SELECT s.relname AS table_name, s.indexrelname AS index_name, s.idx_scan,
+               s.idx_tup_read, s.idx_tup_fetch, i.indisvalid AS valid,
+               pg_relation_size(s.indexrelid) AS size_bytes
+        FROM pg_stat_user_indexes s
+        JOIN pg_index i ON i.indexrelid = s.indexrelid
+        WHERE s.relname = ANY(:tables)
+        ORDER BY s.relname, s.idx_scan DESC
+    """), {'tables': list(tables)}).mappings().all()
+
+    table_scans = conn.execute(text("""
+        SELECT relname AS table_name, seq_scan, seq_tup_read, idx_scan, n_live_tup
+        FROM pg_stat_user_tables
+        WHERE relname = ANY(:tables)
+        ORDER BY relname
+    """), {'tables': list(tables)}).mappings().all()
+
+    return {
+        'indexes': [dict(row) for row in indexes],
+        'tables': [dict(row) for row in table_scans]
+    }
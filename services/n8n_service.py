@@ -66,12 +66,12 @@ class N8nService:
             
         except requests.exceptions.RequestException as e:
             logging.error(f"Error checking workflow status: {str(e)}")
-            # Return a mock completed status to prevent hanging
+            # Status unknown: keep the report pending instead of faking completion
             return {
                 "execution_id": execution_id,
-                "finished": True,
-                "success": True,
-                "status": "completed"
+                "finished": False,
+                "success": False,
+                "status": "unknown"
             }
         except Exception as e:
             logging.error(f"Unexpected error in check_workflow_status: {str(e)}")
@@ -1,8 +1,61 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, Query
 import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.cache_service import TTLCache
+from services.query_metrics import QueryMetrics, SUMMARY_COUNTERS, summarize_profile
+
+# Node labels that hold company data; labels are interpolated into Cypher,
+# so only values from this tuple may ever be used in a query string
+COMPANY_LABELS = ('SUK', 'FEDERTERZIARIO', 'STARTUP')
+
+DEFAULT_CACHE_TTL = 300
+
+# Bounds for relationship subgraphs returned to the network view
+DEFAULT_MIN_WEIGHT = 3
+DEFAULT_EDGES_PER_NODE = 50
+DEFAULT_MAX_NODES = 200
+
+# Property names accepted for projections built into Cypher strings
+FIELD_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Full-text index per label over name, sector and description
+FULLTEXT_INDEXES = {
+    'SUK': ('suk_company_search', ('nome_azienda', 'settore', 'descrizione')),
+    'FEDERTERZIARIO': ('federterziario_company_search', ('nome_azienda', 'settore', 'descrizione')),
+    'STARTUP': ('startup_company_search', ('nome_azienda', 'tipologia_attivita', 'descrizione'))
+}
+
+LUCENE_SPECIAL_CHARS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+# Range indexes backing exact-match lookups (name, STARTUP region/province)
+RANGE_INDEXES = {
+    'suk_nome_azienda': ('SUK', 'nome_azienda'),
+    'federterziario_nome_azienda': ('FEDERTERZIARIO', 'nome_azienda'),
+    'startup_nome_azienda': ('STARTUP', 'nome_azienda'),
+    'startup_regione': ('STARTUP', 'regione'),
+    'startup_sigla_provincia': ('STARTUP', 'sigla_provincia')
+}
 
 class Neo4jService:
-    def __init__(self, uri, username, password):
+    def __init__(self, uri, username, password, cache_ttls=None, cache_max_entries=256,
+                 bootstrap_schema=True, slow_query_threshold=0.5, profile_sample_rate=0.0):
+        # Latency histograms per query name and the slow-query log
+        self.metrics = QueryMetrics(slow_query_threshold=slow_query_threshold,
+                                    profile_sample_rate=profile_sample_rate)
+        # Sampled PROFILE re-runs happen here, off the request that was slow
+        self._profile_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='neo4j-profile')
+
+        # Read-through cache for list queries; entries are keyed on a per-label
+        # graph version so that invalidate_cache() makes old entries unreachable
+        self.cache = TTLCache(max_entries=cache_max_entries, default_ttl=DEFAULT_CACHE_TTL)
+        self.cache_ttls = {label: DEFAULT_CACHE_TTL for label in COMPANY_LABELS}
+        self.cache_ttls.update(cache_ttls or {})
+        self.graph_versions = {label: 0 for label in COMPANY_LABELS}
+        # Optional in-memory relationship snapshot (services.graph_snapshot.GraphSnapshot)
+        self.snapshot = None
+
         try:
             self.driver = GraphDatabase.driver(uri, auth=(username, password))
             # Test connection
@@ -13,10 +66,223 @@ class Neo4jService:
             logging.error(f"Neo4j connection failed: {str(e)}")
             self.driver = None
 
+        if self.driver and bootstrap_schema:
+            self.ensure_schema()
+
     def close(self):
         if self.driver:
             self.driver.close()
 
+    def _run(self, session, query_name, cypher, profile=True, timeout=None, **parameters):
+        """Run a query and return its records, recording latency, rows and counters.
+
+        Records are fetched eagerly so the timing covers streaming the result.
+        Queries slower than the threshold go to the slow-query log and, when
+        sampled, are re-run with PROFILE in the background (only set
+        profile=True for reads).
+        A timeout in seconds is enforced by the server, which aborts the query.
+        """
+        started = time.perf_counter()
+        try:
+            result = session.run(Query(cypher, timeout=timeout) if timeout else cypher, parameters)
+            records = list(result)
+            summary = result.consume()
+        except Exception:
+            self.metrics.record_error(query_name, time.perf_counter() - started)
+            raise
+        elapsed = time.perf_counter() - started
+
+        counters = {}
+        for counter in SUMMARY_COUNTERS:
+            value = getattr(summary.counters, counter, 0)
+            if value:
+                counters[counter] = value
+        server_ms = (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+        self.metrics.record(query_name, elapsed, len(records), server_ms, counters)
+
+        if self.metrics.is_slow(elapsed):
+            entry = self.metrics.record_slow_query(query_name, elapsed, len(records), parameters.keys())
+            if profile and self.metrics.should_profile(query_name):
+                self._profile_executor.submit(self._capture_profile, entry, query_name, cypher, timeout, parameters)
+
+        return records
+
+    def _capture_profile(self, entry, query_name, cypher, timeout, parameters):
+        """Re-run a slow query with PROFILE and attach the plan to its slow-query log entry"""
+        try:
+            with self.driver.session() as session:
+                profiled = session.run(Query("PROFILE " + cypher, timeout=timeout) if timeout
+                                       else "PROFILE " + cypher, parameters)
+                self.metrics.attach_profile(entry, summarize_profile(profiled.consume().profile))
+        except Exception as e:
+            logging.warning(f"PROFILE capture for '{query_name}' failed: {str(e)}")
+
+    def _schema_definitions(self):
+        """Yield (name, type, label, properties, create statement) for every managed index"""
+        for index_name, (label, prop) in RANGE_INDEXES.items():
+            yield (index_name, 'RANGE', label, (prop,), f"""
+                CREATE INDEX {index_name} IF NOT EXISTS
+                FOR (n:{label}) ON (n.{prop})
+            """)
+
+        for label, (index_name, properties) in FULLTEXT_INDEXES.items():
+            indexed = ", ".join(f"n.{prop}" for prop in properties)
+            yield (index_name, 'FULLTEXT', label, properties, f"""
+                CREATE FULLTEXT INDEX {index_name} IF NOT EXISTS
+                FOR (n:{label}) ON EACH [{indexed}]
+            """)
+
+    def _show_indexes(self, session):
+        result = self._run(session, 'show_indexes', """
+            SHOW INDEXES 
+            YIELD name, type, labelsOrTypes, properties, state, populationPercent
+            RETURN name, type, labelsOrTypes, properties, state, populationPercent
+        """, profile=False)
+        return [record.data() for record in result]
+
+    @staticmethod
+    def _find_index(indexes, index_type, label, properties):
+        # Match on schema rather than name: IF NOT EXISTS is a no-op when an
+        # equivalent index already exists under a different name
+        for index in indexes:
+            if (index['type'] == index_type
+                    and (index['labelsOrTypes'] or []) == [label]
+                    and tuple(index['properties'] or []) == tuple(properties)):
+                return index
+        return None
+
+    def ensure_schema(self, create=True):
+        """Create the range and full-text indexes the service relies on (idempotent).
+
+        Returns one entry per managed index with whether it was created by this
+        call, its state and population percentage; with create=False nothing
+        is created and the current state is only reported.
+        """
+        if not self.driver:
+            logging.warning("Neo4j driver not available, skipping schema bootstrap")
+            return []
+
+        report = []
+        try:
+            with self.driver.session() as session:
+                existing = self._show_indexes(session)
+                definitions = list(self._schema_definitions())
+
+                created = set()
+                for index_name, index_type, label, properties, statement in definitions:
+                    if self._find_index(existing, index_type, label, properties):
+                        continue
+                    if create:
+                        self._run(session, f'create_index:{index_name}', statement, profile=False)
+                        created.add(index_name)
+                        logging.info(f"Created Neo4j {index_type.lower()} index {index_name}")
+
+                current = self._show_indexes(session) if created else existing
+                for index_name, index_type, label, properties, _ in definitions:
+                    index = self._find_index(current, index_type, label, properties)
+                    report.append({
+                        'name': index['name'] if index else index_name,
+                        'type': index_type,
+                        'label': label,
+                        'properties': list(properties),
+                        'created': index_name in created,
+                        'state': index['state'] if index else 'MISSING',
+                        'population_percent': index['populationPercent'] if index else None
+                    })
+        except Exception as e:
+            logging.error(f"Error bootstrapping Neo4j schema: {str(e)}")
+
+        return report
+
+    @staticmethod
+    def _build_fulltext_query(search_term):
+        """Turn free text into a Lucene query matching every word, also as a prefix"""
+        clauses = []
+        for token in search_term.lower().split():
+            escaped = LUCENE_SPECIAL_CHARS.sub(r'\\\1', token)
+            clauses.append(f"({escaped} OR {escaped}*)")
+        return " AND ".join(clauses)
+
+    def _search_label(self, label, search_term, limit):
+        """Full-text search over a label, falling back to a name scan if the index is unusable"""
+        query = self._build_fulltext_query(search_term)
+        if not query:
+            return []
+
+        try:
+            return self._cached(label, ('search', query, limit),
+                                lambda: self._fetch_fulltext_search(label, query, limit))
+        except Exception as e:
+            logging.warning(f"Full-text search on {label} failed, falling back to name scan: {str(e)}")
+
+        with self.driver.session() as session:
+            result = self._run(session, f'search_fallback:{label}', f"""
+                MATCH (n:{label}) 
+                WHERE n.nome_azienda IS NOT NULL 
+                AND toLower(n.nome_azienda) CONTAINS toLower($search_term)
+                RETURN properties(n) as company_properties
+                ORDER BY n.nome_azienda
+                LIMIT $limit
+            """, search_term=search_term, limit=limit)
+            return [record["company_properties"] for record in result]
+
+    def _fetch_fulltext_search(self, label, query, limit):
+        with self.driver.session() as session:
+            result = self._run(session, f'search:{label}', """
+                CALL db.index.fulltext.queryNodes($index_name, $query) 
+                YIELD node, score
+                WHERE node.nome_azienda IS NOT NULL
+                RETURN properties(node) as company_properties, score
+                ORDER BY score DESC
+                LIMIT $limit
+            """, index_name=FULLTEXT_INDEXES[label][0], query=query, limit=limit)
+
+            companies = []
+            for record in result:
+                company = dict(record["company_properties"])
+                company['search_score'] = record["score"]
+                companies.append(company)
+            return companies
+
+    def _cached(self, label, key, loader):
+        """Return loader() through the cache, scoped to the label's graph version"""
+        cache_key = (label, self.graph_versions[label]) + tuple(key)
+        return self.cache.get_or_load(cache_key, loader, ttl=self.cache_ttls.get(label))
+
+    def invalidate_cache(self, label=None):
+        """Bump the graph version of one label (or all) and drop its cached entries"""
+        labels = [label] if label else list(COMPANY_LABELS)
+        for item in labels:
+            if item not in self.graph_versions:
+                raise ValueError(f"Unknown company label: {item}")
+
+        for item in labels:
+            self.graph_versions[item] += 1
+        if self.snapshot:
+            self.snapshot.request_refresh(labels)
+        removed = self.cache.invalidate(lambda key: key[0] in labels)
+        logging.info(f"Neo4j cache invalidated for {', '.join(labels)} ({removed} entries dropped)")
+        return removed
+
+    def cache_stats(self):
+        """Return cache counters together with the current graph versions"""
+        stats = self.cache.stats()
+        stats['ttls'] = dict(self.cache_ttls)
+        stats['graph_versions'] = dict(self.graph_versions)
+        if self.snapshot:
+            stats['snapshot'] = self.snapshot.stats()
+        return stats
+
+    def _fetch_companies_list(self, label):
+        with self.driver.session() as session:
+            result = self._run(session, f'companies_list:{label}', f"""
+                MATCH (n:{label}) 
+                WHERE n.nome_azienda IS NOT NULL
+                RETURN properties(n) as company_properties
+                ORDER BY n.nome_azienda
+            """)
+            return [record["company_properties"] for record in result]
+
     def get_company_count(self):
         """Get total count of companies in Neo4j"""
         if not self.driver:
@@ -25,8 +291,8 @@ class Neo4jService:
 
         try:
             with self.driver.session() as session:
-                result = session.run("MATCH (n:SUK) RETURN count(n) as count")
-                record = result.single()
+                result = self._run(session, 'company_count', "MATCH (n:SUK) RETURN count(n) as count")
+                record = result[0] if result else None
                 return record["count"] if record else 0
         except Exception as e:
             logging.error(f"Error getting company count: {str(e)}")
@@ -45,18 +311,94 @@ class Neo4jService:
             ]
 
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH (n:SUK) 
-                    WHERE n.nome_azienda IS NOT NULL
-                    RETURN properties(n) as company_properties
-                    ORDER BY n.nome_azienda
-                """)
-                return [record["company_properties"] for record in result]
+            return self._cached('SUK', ('companies_list',),
+                                lambda: self._fetch_companies_list('SUK'))
         except Exception as e:
             logging.error(f"Error getting companies list: {str(e)}")
             return []
 
+    def get_companies_page(self, label, limit=None, after=None, fields=None):
+        """Get companies ordered by name as a keyset page, optionally projected to fields.
+
+        Pages are ordered on (nome_azienda, elementId) so companies sharing a
+        name are neither skipped nor repeated; after is the (name, id) pair
+        returned as next_after by the previous page. Without a limit the whole
+        (cached) list is returned. Field names must be plain identifiers since
+        they are interpolated into the projection.
+        """
+        if label not in COMPANY_LABELS:
+            raise ValueError(f"Unknown company label: {label}")
+
+        if fields is not None:
+            for field in fields:
+                if not FIELD_NAME_PATTERN.match(field):
+                    raise ValueError(f"Invalid field name: {field}")
+            fields = ['nome_azienda'] + [field for field in fields if field != 'nome_azienda']
+
+        if not self.driver or limit is None:
+            list_getters = {
+                'SUK': self.get_companies_list,
+                'FEDERTERZIARIO': self.get_federterziario_companies_list,
+                'STARTUP': self.get_startup_companies_list
+            }
+            # The list has no element ids: the position in the name-ordered list breaks ties
+            keyed = [((c.get('nome_azienda') or ''), f"{position:010d}", c)
+                     for position, c in enumerate(list_getters[label]())]
+            if after is not None:
+                keyed = [entry for entry in keyed if (entry[0], entry[1]) > tuple(after)]
+            if limit is not None:
+                has_more = len(keyed) > limit
+                keyed = keyed[:limit]
+            else:
+                has_more = False
+            last_key = list(keyed[-1][:2]) if keyed else None
+            companies = [c for _, _, c in keyed]
+            if fields is not None:
+                companies = [{field: c[field] for field in fields if c.get(field) is not None}
+                             for c in companies]
+        else:
+            try:
+                rows = self._cached(
+                    label, ('companies_page', tuple(after) if after else None, limit, tuple(fields or ())),
+                    lambda: self._fetch_companies_page(label, limit + 1, after, fields))
+            except Exception as e:
+                logging.error(f"Error getting {label} companies page: {str(e)}")
+                rows = []
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            last_key = list(rows[-1][:2]) if rows else None
+            companies = [company for _, _, company in rows]
+
+        return {
+            'companies': companies,
+            'next_after': last_key if has_more else None,
+            'has_more': has_more
+        }
+
+    def _fetch_companies_page(self, label, limit, after, fields):
+        """Return (nome_azienda, element_id, company) rows after the (name, id) key"""
+        if fields is None:
+            projection = "properties(n)"
+        else:
+            projection = "n {" + ", ".join(f".`{field}`" for field in fields) + "}"
+
+        with self.driver.session() as session:
+            after_name, after_id = after if after else (None, None)
+            result = self._run(session, f'companies_page:{label}', f"""
+                MATCH (n:{label}) 
+                WHERE n.nome_azienda IS NOT NULL
+                AND ($after_name IS NULL
+                     OR n.nome_azienda > $after_name
+                     OR (n.nome_azienda = $after_name AND elementId(n) > $after_id))
+                RETURN n.nome_azienda as nome_azienda, elementId(n) as element_id,
+                       {projection} as company_properties
+                ORDER BY n.nome_azienda, elementId(n)
+                LIMIT $limit
+            """, after_name=after_name, after_id=after_id, limit=limit)
+            return [(record["nome_azienda"], record["element_id"],
+                     {key: value for key, value in record["company_properties"].items() if value is not None})
+                    for record in result]
+
     def get_sector_aggregations(self):
         """Get aggregated data by sector - unwind arrays and count individual elements"""
         if not self.driver:
@@ -71,7 +413,7 @@ class Neo4jService:
 
         try:
             with self.driver.session() as session:
-                result = session.run("""
+                result = self._run(session, 'sector_aggregations', """
                     MATCH (n:SUK) 
                     WHERE n.settore IS NOT NULL
                     UNWIND n.settore AS settore_item
@@ -87,6 +429,59 @@ class Neo4jService:
             logging.error(f"Error getting sector aggregations: {str(e)}")
             return []
 
+    def get_dashboard_aggregates(self, raise_errors=False, timeout=None):
+        """Get company count, distinct sector count and top sectors in a single query.
+
+        With raise_errors=True query failures propagate instead of being
+        reported as zero counts, so callers can tell Neo4j is unavailable.
+        timeout (seconds) bounds the query on the server.
+        """
+        if not self.driver:
+            logging.warning("Neo4j driver not available, returning mock data")
+            return {
+                'company_count': self.get_company_count(),
+                'sector_count': self.get_total_sector_count(),
+                'sector_distribution': self.get_sector_aggregations()
+            }
+
+        try:
+            return self._cached('SUK', ('dashboard_aggregates',),
+                                lambda: self._fetch_dashboard_aggregates(timeout))
+        except Exception as e:
+            logging.error(f"Error getting dashboard aggregates: {str(e)}")
+            if raise_errors:
+                raise
+            return {'company_count': 0, 'sector_count': 0, 'sector_distribution': []}
+
+    def _fetch_dashboard_aggregates(self, timeout=None):
+        # Both aggregates run server-side in one round trip and the settore
+        # arrays are unwound once for the distinct count and the top 10
+        with self.driver.session() as session:
+            result = self._run(session, 'dashboard_aggregates', """
+                CALL {
+                    MATCH (n:SUK)
+                    RETURN count(n) as company_count
+                }
+                CALL {
+                    MATCH (n:SUK) 
+                    WHERE n.settore IS NOT NULL
+                    UNWIND n.settore AS settore_item
+                    WITH settore_item, collect(DISTINCT n.nome_azienda) AS companies
+                    ORDER BY size(companies) DESC
+                    RETURN count(settore_item) as sector_count,
+                           collect({
+                               settore: settore_item,
+                               count: size(companies),
+                               sample_companies: companies[0..5]
+                           })[0..10] as sector_distribution
+                }
+                RETURN company_count, sector_count, sector_distribution
+            """, timeout=timeout)
+            record = result[0] if result else None
+            if not record:
+                return {'company_count': 0, 'sector_count': 0, 'sector_distribution': []}
+            return record.data()
+
     def get_company_details(self, company_name):
         """Get detailed information for a specific company"""
         if not self.driver:
@@ -95,13 +490,13 @@ class Neo4jService:
 
         try:
             with self.driver.session() as session:
-                result = session.run("""
+                result = self._run(session, 'company_details:SUK', """
                     MATCH (n:SUK) 
                     WHERE n.nome_azienda = $company_name
                     RETURN properties(n) as company_properties
                 """, company_name=company_name)
 
-                record = result.single()
+                record = result[0] if result else None
                 if record:
                     return record["company_properties"]
                 return None
@@ -109,22 +504,46 @@ class Neo4jService:
             logging.error(f"Error getting company details: {str(e)}")
             return None
 
+    def get_companies_details_batch(self, label, company_names):
+        """Get detailed information for several companies of a label in one query.
+
+        Returns a dict keyed by company name; names without a match map to None.
+        """
+        if label not in COMPANY_LABELS:
+            raise ValueError(f"Unknown company label: {label}")
+
+        # Deduplicate while keeping the caller's order
+        names = list(dict.fromkeys(company_names))
+        details = {name: None for name in names}
+
+        if not self.driver:
+            logging.warning("Neo4j driver not available")
+            return details
+
+        try:
+            with self.driver.session() as session:
+                result = self._run(session, f'company_details_batch:{label}', f"""
+                    UNWIND $names AS name
+                    MATCH (n:{label}) 
+                    WHERE n.nome_azienda = name
+                    RETURN name, properties(n) as company_properties
+                """, names=names)
+
+                for record in result:
+                    details[record["name"]] = record["company_properties"]
+                return details
+        except Exception as e:
+            logging.error(f"Error getting {label} company details batch: {str(e)}")
+            return details
+
     def search_companies(self, search_term):
-        """Search companies by name"""
+        """Search companies by name, sector and description, best matches first"""
         if not self.driver:
             logging.warning("Neo4j driver not available")
             return []
 
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH (n:SUK) 
-                    WHERE n.nome_azienda CONTAINS $search_term
-                    RETURN properties(n) as company_properties
-                    ORDER BY n.nome_azienda
-                    LIMIT 20
-                """, search_term=search_term)
-                return [record["company_properties"] for record in result]
+            return self._search_label('SUK', search_term, 20)
         except Exception as e:
             logging.error(f"Error searching companies: {str(e)}")
             return []
@@ -158,61 +577,149 @@ class Neo4jService:
             }
 
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH p=(n:SUK)-[r]->(m:SUK) 
-                    WHERE n.nome_azienda = $company_name AND r.weight >= 3 
-                    RETURN n.nome_azienda as source_name, 
-                           m.nome_azienda as target_name,
-                           properties(r) as relationship_properties,
-                           r.weight as weight,
-                           type(r) as type
-                """, company_name=company_name)
+            return self.get_company_subgraph('SUK', company_name)
+        except Exception as e:
+            logging.error(f"Error getting company relationships: {str(e)}")
+            return {'nodes': [], 'edges': []}
 
-                relationships = []
-                related_companies = set()
+    def get_company_subgraph(self, label, company_name, depth=1, min_weight=DEFAULT_MIN_WEIGHT,
+                             max_edges_per_node=DEFAULT_EDGES_PER_NODE, relationship_types=None,
+                             max_nodes=DEFAULT_MAX_NODES):
+        """Get the outgoing relationship neighbourhood of a company up to depth hops.
 
+        Every expanded node keeps only its max_edges_per_node heaviest edges with
+        weight >= min_weight (optionally restricted to relationship_types), and
+        expansion stops once max_nodes distinct companies have been collected.
+        Nodes and edges are deduplicated; 'truncated' tells whether max_nodes was hit.
+        Query errors propagate to the caller.
+        """
+        if label not in COMPANY_LABELS:
+            raise ValueError(f"Unknown company label: {label}")
+
+        if not self.driver:
+            relationship_getters = {
+                'SUK': self.get_company_relationships,
+                'FEDERTERZIARIO': self.get_federterziario_company_relationships,
+                'STARTUP': self.get_startup_company_relationships
+            }
+            graph = relationship_getters[label](company_name)
+            graph['truncated'] = False
+            return graph
+
+        types = sorted(relationship_types) if relationship_types else None
+
+        graph = self.snapshot.get(label) if self.snapshot else None
+        if graph is not None:
+            return graph.subgraph(company_name, depth, min_weight, max_edges_per_node, types, max_nodes)
+
+        cache_key = ('subgraph', company_name, depth, min_weight, max_edges_per_node,
+                     tuple(types or ()), max_nodes)
+        return self._cached(label, cache_key, lambda: self._fetch_company_subgraph(
+            label, company_name, depth, min_weight, max_edges_per_node, types, max_nodes))
+
+    def _fetch_company_subgraph(self, label, company_name, depth, min_weight,
+                                max_edges_per_node, types, max_nodes):
+        nodes = {}
+        edges = {}
+        truncated = False
+        frontier = [company_name]
+        expanded = set()
+
+        with self.driver.session() as session:
+            for hop in range(depth):
+                frontier = [name for name in frontier if name not in expanded]
+                if not frontier:
+                    break
+                expanded.update(frontier)
+
+                # One query per hop: top-N heaviest edges for every frontier node
+                result = self._run(session, f'subgraph_hop:{label}', f"""
+                    UNWIND $frontier AS name
+                    MATCH (n:{label})-[r]->(m:{label}) 
+                    WHERE n.nome_azienda = name AND r.weight >= $min_weight
+                    AND ($types IS NULL OR type(r) IN $types)
+                    WITH n, r, m
+                    ORDER BY r.weight DESC
+                    WITH n, collect({{
+                        target_name: m.nome_azienda,
+                        relationship_properties: properties(r),
+                        weight: r.weight,
+                        type: type(r)
+                    }})[0..$max_edges] as top_edges
+                    UNWIND top_edges AS edge
+                    RETURN n.nome_azienda as source_name, 
+                           edge.target_name as target_name,
+                           edge.relationship_properties as relationship_properties,
+                           edge.weight as weight,
+                           edge.type as type
+                """, frontier=frontier, min_weight=min_weight, types=types,
+                    max_edges=max_edges_per_node)
+
+                if not nodes:
+                    nodes[company_name] = {'id': company_name, 'name': company_name,
+                                           'type': 'center', 'depth': 0}
+
+                next_frontier = []
                 for record in result:
                     source = record["source_name"]
                     target = record["target_name"]
-                    weight = record["weight"]
-                    rel_props = record["relationship_properties"]
                     rel_type = record["type"]
 
+                    if target not in nodes:
+                        if len(nodes) >= max_nodes:
+                            truncated = True
+                            continue
+                        nodes[target] = {'id': target, 'name': target,
+                                         'type': 'related', 'depth': hop + 1}
+                        next_frontier.append(target)
+
+                    edge_key = (source, target, rel_type)
+                    if edge_key in edges:
+                        continue
+
                     # Aggiungi il tipo alle proprietà della relazione
-                    if rel_props is None:
-                        rel_props = {}
+                    rel_props = dict(record["relationship_properties"] or {})
                     rel_props['type'] = rel_type
 
-                    relationships.append({
+                    edges[edge_key] = {
                         'source': source,
                         'target': target,
-                        'weight': weight,
+                        'weight': record["weight"],
                         'type': rel_type,
                         'properties': rel_props
-                    })
-
-                    related_companies.add(source)
-                    related_companies.add(target)
-
-                # Create nodes
-                nodes = []
-                for company in related_companies:
-                    node_type = 'center' if company == company_name else 'related'
-                    nodes.append({
-                        'id': company,
-                        'name': company,
-                        'type': node_type
-                    })
-
-                return {
-                    'nodes': nodes,
-                    'edges': relationships
-                }
+                    }
 
-        except Exception as e:
-            logging.error(f"Error getting company relationships: {str(e)}")
-            return {'nodes': [], 'edges': []}
+                frontier = next_frontier
+
+        # A lone center node without edges means no relationships were found
+        if not edges:
+            nodes = {}
+
+        return {
+            'nodes': list(nodes.values()),
+            'edges': list(edges.values()),
+            'truncated': truncated
+        }
+
+    def get_relationship_edges(self, label, min_weight=0):
+        """Get every weighted relationship between companies of a label as
+        (source, target, type, weight, properties) tuples, for in-memory snapshots"""
+        if label not in COMPANY_LABELS:
+            raise ValueError(f"Unknown company label: {label}")
+
+        with self.driver.session() as session:
+            result = self._run(session, f'relationship_edges:{label}', f"""
+                MATCH (n:{label})-[r]->(m:{label}) 
+                WHERE n.nome_azienda IS NOT NULL AND m.nome_azienda IS NOT NULL
+                AND r.weight >= $min_weight
+                RETURN n.nome_azienda as source_name, 
+                       m.nome_azienda as target_name,
+                       type(r) as type,
+                       r.weight as weight,
+                       properties(r) as relationship_properties
+            """, min_weight=min_weight)
+            return [(record["source_name"], record["target_name"], record["type"],
+                     record["weight"], record["relationship_properties"]) for record in result]
 
     def get_total_sector_count(self):
         """Get total count of unique sectors in Neo4j"""
@@ -222,13 +729,13 @@ class Neo4jService:
 
         try:
             with self.driver.session() as session:
-                result = session.run("""
+                result = self._run(session, 'total_sector_count', """
                     MATCH (n:SUK) 
                     WHERE n.settore IS NOT NULL
                     UNWIND n.settore AS settore_item
                     RETURN count(DISTINCT settore_item) as total_sectors
                 """)
-                record = result.single()
+                record = result[0] if result else None
                 return record["total_sectors"] if record else 0
         except Exception as e:
             logging.error(f"Error getting total sector count: {str(e)}")
@@ -255,7 +762,7 @@ class Neo4jService:
 
         try:
             with self.driver.session() as session:
-                result = session.run("""
+                result = self._run(session, 'companies_by_sector', """
                     MATCH (n:SUK) 
                     WHERE ANY(settore_item IN n.settore WHERE toLower(settore_item) = toLower($sector))
                     RETURN n.nome_azienda as nome_azienda,
@@ -283,18 +790,24 @@ class Neo4jService:
             ]
 
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH (n:FEDERTERZIARIO) 
-                    WHERE n.nome_azienda IS NOT NULL
-                    RETURN properties(n) as company_properties
-                    ORDER BY n.nome_azienda
-                """)
-                return [record["company_properties"] for record in result]
+            return self._cached('FEDERTERZIARIO', ('companies_list',),
+                                lambda: self._fetch_companies_list('FEDERTERZIARIO'))
         except Exception as e:
             logging.error(f"Error getting FEDERTERZIARIO companies list: {str(e)}")
             return []
 
+    def search_federterziario_companies(self, search_term):
+        """Search FEDERTERZIARIO companies by name, sector and description, best matches first"""
+        if not self.driver:
+            logging.warning("Neo4j driver not available")
+            return []
+
+        try:
+            return self._search_label('FEDERTERZIARIO', search_term, 20)
+        except Exception as e:
+            logging.error(f"Error searching FEDERTERZIARIO companies: {str(e)}")
+            return []
+
     def get_federterziario_company_details(self, company_name):
         """Get detailed information for a specific FEDERTERZIARIO company"""
         if not self.driver:
@@ -303,13 +816,13 @@ class Neo4jService:
 
         try:
             with self.driver.session() as session:
-                result = session.run("""
+                result = self._run(session, 'company_details:FEDERTERZIARIO', """
                     MATCH (n:FEDERTERZIARIO) 
                     WHERE n.nome_azienda = $company_name
                     RETURN properties(n) as company_properties
                 """, company_name=company_name)
 
-                record = result.single()
+                record = result[0] if result else None
                 if record:
                     return record["company_properties"]
                 return None
@@ -346,58 +859,7 @@ class Neo4jService:
             }
 
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH p=(n:FEDERTERZIARIO)-[r]->(m:FEDERTERZIARIO) 
-                    WHERE n.nome_azienda = $company_name AND r.weight >= 3 
-                    RETURN n.nome_azienda as source_name, 
-                           m.nome_azienda as target_name,
-                           properties(r) as relationship_properties,
-                           r.weight as weight,
-                           type(r) as type
-                """, company_name=company_name)
-
-                relationships = []
-                related_companies = set()
-
-                for record in result:
-                    source = record["source_name"]
-                    target = record["target_name"]
-                    weight = record["weight"]
-                    rel_props = record["relationship_properties"]
-                    rel_type = record["type"]
-
-                    # Aggiungi il tipo alle proprietà della relazione
-                    if rel_props is None:
-                        rel_props = {}
-                    rel_props['type'] = rel_type
-
-                    relationships.append({
-                        'source': source,
-                        'target': target,
-                        'weight': weight,
-                        'type': rel_type,
-                        'properties': rel_props
-                    })
-
-                    related_companies.add(source)
-                    related_companies.add(target)
-
-                # Create nodes
-                nodes = []
-                for company in related_companies:
-                    node_type = 'center' if company == company_name else 'related'
-                    nodes.append({
-                        'id': company,
-                        'name': company,
-                        'type': node_type
-                    })
-
-                return {
-                    'nodes': nodes,
-                    'edges': relationships
-                }
-
+            return self.get_company_subgraph('FEDERTERZIARIO', company_name)
         except Exception as e:
             logging.error(f"Error getting FEDERTERZIARIO company relationships: {str(e)}")
             return {'nodes': [], 'edges': []}
@@ -413,20 +875,14 @@ class Neo4jService:
             ]
 
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH (n:STARTUP) 
-                    WHERE n.nome_azienda IS NOT NULL
-                    RETURN properties(n) as company_properties
-                    ORDER BY n.nome_azienda
-                """)
-                return [record["company_properties"] for record in result]
+            return self._cached('STARTUP', ('companies_list',),
+                                lambda: self._fetch_companies_list('STARTUP'))
         except Exception as e:
             logging.error(f"Error getting STARTUP companies list: {str(e)}")
             return []
 
     def search_startup_companies(self, search_term):
-        """Search STARTUP companies by name"""
+        """Search STARTUP companies by name, activity and description, best matches first"""
         if not self.driver:
             logging.warning("Neo4j driver not available, returning mock data")
             return [
@@ -435,16 +891,7 @@ class Neo4jService:
             ]
 
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH (n:STARTUP) 
-                    WHERE n.nome_azienda IS NOT NULL 
-                    AND toLower(n.nome_azienda) CONTAINS toLower($search_term)
-                    RETURN properties(n) as company_properties
-                    ORDER BY n.nome_azienda
-                    LIMIT 50
-                """, search_term=search_term)
-                return [record["company_properties"] for record in result]
+            return self._search_label('STARTUP', search_term, 50)
         except Exception as e:
             logging.error(f"Error searching STARTUP companies: {str(e)}")
             return []
@@ -457,19 +904,41 @@ class Neo4jService:
 
         try:
             with self.driver.session() as session:
-                result = session.run("""
+                result = self._run(session, 'company_details:STARTUP', """
                     MATCH (n:STARTUP) 
                     WHERE n.nome_azienda = $company_name
                     RETURN properties(n) as company_properties
                 """, company_name=company_name)
 
-                record = result.single()
+                record = result[0] if result else None
                 if record:
                     return record["company_properties"]
                 return None
         except Exception as e:
             logging.error(f"Error getting STARTUP company details: {str(e)}")
-            return Nonene
+            return None
+
+    def get_startup_regions(self):
+        """Get STARTUP company counts per region; query errors propagate"""
+        with self.driver.session() as session:
+            result = self._run(session, 'startup_regions', """
+                MATCH (n:STARTUP) 
+                WHERE n.regione IS NOT NULL
+                RETURN n.regione as REGIONE, count(n) as COUNT 
+                ORDER BY REGIONE
+            """)
+            return [record.data() for record in result]
+
+    def get_startup_provinces(self, region):
+        """Get STARTUP company counts per province of a region; query errors propagate"""
+        with self.driver.session() as session:
+            result = self._run(session, 'startup_provinces', """
+                MATCH (n:STARTUP) 
+                WHERE n.regione = $region AND n.sigla_provincia IS NOT NULL
+                RETURN n.sigla_provincia as PROVINCIA, count(n) as COUNT 
+                ORDER BY PROVINCIA
+            """, region=region)
+            return [record.data() for record in result]
 
     def get_startup_company_relationships(self, company_name):
         """Get relationships for a specific STARTUP company"""
@@ -500,58 +969,7 @@ class Neo4jService:
             }
 
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH p=(n:STARTUP)-[r]->(m:STARTUP) 
-                    WHERE n.nome_azienda = $company_name AND r.weight >= 3 
-                    RETURN n.nome_azienda as source_name, 
-                           m.nome_azienda as target_name,
-                           properties(r) as relationship_properties,
-                           r.weight as weight,
-                           type(r) as type
-                """, company_name=company_name)
-
-                relationships = []
-                related_companies = set()
-
-                for record in result:
-                    source = record["source_name"]
-                    target = record["target_name"]
-                    weight = record["weight"]
-                    rel_props = record["relationship_properties"]
-                    rel_type = record["type"]
-
-                    # Aggiungi il tipo alle proprietà della relazione
-                    if rel_props is None:
-                        rel_props = {}
-                    rel_props['type'] = rel_type
-
-                    relationships.append({
-                        'source': source,
-                        'target': target,
-                        'weight': weight,
-                        'type': rel_type,
-                        'properties': rel_props
-                    })
-
-                    related_companies.add(source)
-                    related_companies.add(target)
-
-                # Create nodes
-                nodes = []
-                for company in related_companies:
-                    node_type = 'center' if company == company_name else 'related'
-                    nodes.append({
-                        'id': company,
-                        'name': company,
-                        'type': node_type
-                    })
-
-                return {
-                    'nodes': nodes,
-                    'edges': relationships
-                }
-
+            return self.get_company_subgraph('STARTUP', company_name)
         except Exception as e:
             logging.error(f"Error getting STARTUP company relationships: {str(e)}")
             return {'nodes': [], 'edges': []}
\ No newline at end of file
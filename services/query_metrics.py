@@ -0,0 +1,156 @@
+import bisect
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Minimum seconds between two PROFILE captures of the same query
+PROFILE_MIN_INTERVAL = 60
+
+# Result-summary counters worth keeping per query
+SUMMARY_COUNTERS = (
+    'nodes_created', 'nodes_deleted', 'relationships_created', 'relationships_deleted',
+    'properties_set', 'labels_added', 'labels_removed', 'indexes_added', 'indexes_removed',
+    'constraints_added', 'constraints_removed'
+)
+
+
+class QueryStats:
+    """Latency histogram and totals for one named query.
+
+    count, total_seconds and the histogram cover successful runs only;
+    failed runs are tracked in errors and error_seconds.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.error_seconds = 0.0
+        self.rows = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.server_ms = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.counters = {}
+
+    def observe(self, elapsed, rows, server_ms, counters):
+        self.count += 1
+        self.rows += rows
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        self.server_ms += server_ms or 0
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        # Cumulative bucket counts, Prometheus style ('+Inf' holds the total)
+        histogram = {}
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS + ('+Inf',), self.buckets):
+            cumulative += bucket_count
+            histogram[str(bound)] = cumulative
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'error_avg_ms': round(self.error_seconds / self.errors * 1000, 2) if self.errors else 0.0,
+            'rows': self.rows,
+            'avg_ms': round(self.total_seconds / self.count * 1000, 2) if self.count else 0.0,
+            'max_ms': round(self.max_seconds * 1000, 2),
+            'server_ms': self.server_ms,
+            'latency_buckets': histogram,
+            'counters': dict(self.counters)
+        }
+
+
+class QueryMetrics:
+    """Per-query latency histograms plus a bounded slow-query log"""
+
+    def __init__(self, slow_query_threshold=0.5, profile_sample_rate=0.0, max_slow_queries=100,
+                 profile_min_interval=PROFILE_MIN_INTERVAL):
+        self.slow_query_threshold = slow_query_threshold
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_min_interval = profile_min_interval
+        self._profiled_at = {}
+        self._queries = {}
+        self._slow_queries = deque(maxlen=max_slow_queries)
+        self._lock = threading.Lock()
+
+    def record(self, query_name, elapsed, rows=0, server_ms=None, counters=None):
+        with self._lock:
+            stats = self._queries.setdefault(query_name, QueryStats())
+            stats.observe(elapsed, rows, server_ms, counters or {})
+
+    def record_error(self, query_name, elapsed):
+        with self._lock:
+            stats = self._queries.setdefault(query_name, QueryStats())
+            stats.errors += 1
+            stats.error_seconds += elapsed
+
+    def is_slow(self, elapsed):
+        return self.slow_query_threshold is not None and elapsed >= self.slow_query_threshold
+
+    def should_profile(self, query_name):
+        """Sample a slow query for PROFILE, at most once per profile_min_interval per query"""
+        if self.profile_sample_rate <= 0 or random.random() >= self.profile_sample_rate:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._profiled_at.get(query_name)
+            if last is not None and now - last < self.profile_min_interval:
+                return False
+            self._profiled_at[query_name] = now
+            return True
+
+    def record_slow_query(self, query_name, elapsed, rows, parameters, profile=None):
+        """Add a slow-query log entry and return it; attach_profile() fills in a later plan"""
+        logging.warning(f"Slow Neo4j query '{query_name}': {elapsed * 1000:.1f}ms, {rows} rows")
+        entry = {
+            'query_name': query_name,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'rows': rows,
+            'parameters': sorted(parameters),
+            'profile': profile,
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        }
+        with self._lock:
+            self._slow_queries.append(entry)
+        return entry
+
+    def attach_profile(self, entry, profile):
+        with self._lock:
+            entry['profile'] = profile
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'slow_query_threshold_ms': round(self.slow_query_threshold * 1000, 2)
+                if self.slow_query_threshold is not None else None,
+                'profile_sample_rate': self.profile_sample_rate,
+                'queries': {name: stats.to_dict() for name, stats in sorted(self._queries.items())},
+                'slow_queries': [dict(entry) for entry in self._slow_queries]
+            }
+
+
+def summarize_profile(plan):
+    """Reduce a driver ProfiledPlan (or its dict form) to operator, rows and db hits"""
+    if plan is None:
+        return None
+    if not isinstance(plan, dict):
+        plan = {
+            'operatorType': getattr(plan, 'operator_type', None),
+            'rows': getattr(plan, 'rows', None),
+            'dbHits': getattr(plan, 'db_hits', None),
+            'children': getattr(plan, 'children', [])
+        }
+    return {
+        'operator': plan.get('operatorType'),
+        'rows': plan.get('rows'),
+        'db_hits': plan.get('dbHits'),
+        'children': [summarize_profile(child) for child in plan.get('children') or []]
+    }
@@ -0,0 +1,88 @@
+import json
+import logging
+import queue
+import threading
+
+# Report statuses that can still change
+IN_FLIGHT_STATUSES = ('pending', 'processing')
+
+
+def report_event(report):
+    """Payload pushed to clients when a report changes"""
+    return {
+        'report_id': report.id,
+        'status': report.status,
+        'company_name': report.company_name,
+        'report_type': report.report_type,
+        'batch_id': report.batch_id,
+        'file_name': report.file_name,
+        'error_message': report.error_message,
+        'updated_at': report.updated_at.isoformat() if report.updated_at else None
+    }
+
+
+def format_sse(data, event=None, retry=None):
+    """Serialize one Server-Sent Events message"""
+    lines = []
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class ReportEventBroker:
+    """In-process fan-out of report status changes to each user's open streams.
+
+    Events only reach streams served by the same process; the stream endpoint
+    reconciles against the database periodically to pick up changes made
+    elsewhere. A subscriber that falls behind loses events instead of
+    blocking publishers, and catches up on the next reconcile.
+    """
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.published += 1
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                logging.warning(f"Report event stream for user {user_id} is full, dropping event")
+
+    def publish_report(self, report):
+        self.publish(report.user_id, report_event(report))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._subscribers),
+                'streams': sum(len(s) for s in self._subscribers.values()),
+                'published': self.published,
+                'dropped': self.dropped
+            }
@@ -0,0 +1,370 @@
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from urllib3.exceptions import NewConnectionError, ProtocolError, ReadTimeoutError
+from urllib3.util import Timeout
+
+from models import db, Report, ReportBatch, ReportJob
+from services.report_events import IN_FLIGHT_STATUSES
+from services.report_storage import CHUNK_SIZE, ReportStorage, report_file_name
+
+# A webhook call must give up this long before its job counts as stale and is reclaimed
+WEBHOOK_DEADLINE_MARGIN = 30
+
+
+def callback_token(secret, report_id):
+    """Per-report token n8n must present when calling back for report_id"""
+    return hmac.new(secret.encode(), f"report:{report_id}".encode(), hashlib.sha256).hexdigest()
+
+
+def _iter_until(response, deadline):
+    """Yield a streamed response body, failing once the monotonic deadline has passed.
+
+    The body is read one socket read at a time with the socket timeout cut to
+    the time left, so a body that trickles in or stalls can't outlast the
+    deadline either.
+    """
+    sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.ReadTimeout("Report webhook exceeded its deadline")
+        if sock is not None:
+            sock.settimeout(remaining)
+        try:
+            chunk = response.raw.read1(CHUNK_SIZE, decode_content=True)
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ReadTimeout(str(e))
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(str(e))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _never_connected(error):
+    """True when a webhook request failed before a connection to n8n was established.
+
+    Other connection errors (resets, RemoteDisconnected) can happen after the
+    request was sent, when n8n may already be running the workflow.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    # requests wraps urllib3's MaxRetryError, whose reason is the underlying error
+    reason = error.args[0] if error.args else None
+    return isinstance(getattr(reason, 'reason', reason), NewConnectionError)
+
+
+class ReportJobQueue:
+    """Persistent queue of report webhook calls run by a bounded worker pool.
+
+    Jobs live in the report_jobs table, so queued work survives restarts and
+    several processes can share the queue: jobs are claimed with
+    SELECT ... FOR UPDATE SKIP LOCKED and running jobs whose worker died are
+    picked up again once they are older than stale_after seconds.
+    """
+
+    def __init__(self, webhook_url, max_workers=4, poll_interval=5, webhook_timeout=300,
+                 max_attempts=3, retry_delay=30, stale_after=900, storage=None, events=None,
+                 callback_base_url=None, callback_secret=None):
+        self.webhook_url = webhook_url
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.webhook_timeout = webhook_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after
+        # Total time a webhook call may take, kept below stale_after so a slow call
+        # is never reclaimed and run twice while it is still in progress
+        self.webhook_deadline = max(1, min(webhook_timeout, stale_after - WEBHOOK_DEADLINE_MARGIN))
+        self.storage = storage or ReportStorage()
+        self.events = events
+        self.callback_base_url = callback_base_url.rstrip('/') if callback_base_url else None
+        self.callback_secret = callback_secret
+        self.app = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+        self._wakeup = threading.Event()
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self._dispatcher = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def start(self):
+        """Start the dispatcher thread that claims jobs and feeds the worker pool"""
+        if self._dispatcher and self._dispatcher.is_alive():
+            return
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='report-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def enqueue(self, report):
+        """Add a job for report to the current session; the caller commits"""
+        job = ReportJob(report_id=report.id, batch_id=report.batch_id, status='queued', available_at=datetime.utcnow())
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        """Wake the dispatcher after jobs were committed"""
+        self._wakeup.set()
+
+    def _free_slots(self):
+        with self._active_lock:
+            return self.max_workers - self._active
+
+    def _dispatch_loop(self):
+        while True:
+            try:
+                free_slots = self._free_slots()
+                job_ids = self._claim_jobs(free_slots) if free_slots > 0 else []
+                for job_id in job_ids:
+                    with self._active_lock:
+                        self._active += 1
+                    self._executor.submit(self._run_job, job_id)
+            except Exception as e:
+                logging.error(f"Report job dispatcher error: {str(e)}")
+                job_ids = []
+
+            # Claimed a full batch: look again right away, there may be more
+            if job_ids and len(job_ids) == free_slots:
+                continue
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim_jobs(self, limit):
+        """Atomically move up to limit due jobs from queued to running.
+
+        Jobs of a bulk batch are only claimed while fewer than the batch's
+        max_concurrency are running, so one batch can't take every worker.
+        Jobs whose completion callback did not arrive in time are settled here.
+        """
+        with self.app.app_context():
+            now = datetime.utcnow()
+            stale_before = now - timedelta(seconds=self.stale_after)
+
+            # Running jobs and limits of every batch that has work in flight
+            running = dict(db.session.query(ReportJob.batch_id, db.func.count(ReportJob.id))
+                           .filter(ReportJob.batch_id.isnot(None), ReportJob.status == 'running')
+                           .group_by(ReportJob.batch_id).all())
+            limits = dict(db.session.query(ReportBatch.id, ReportBatch.max_concurrency)
+                          .filter(ReportBatch.id.in_(running)).all()) if running else {}
+            saturated = [batch_id for batch_id, count in running.items() if count >= limits.get(batch_id, 1)]
+
+            query = ReportJob.query.filter(
+                db.or_(
+                    db.and_(ReportJob.status == 'queued', ReportJob.available_at <= now),
+                    db.and_(ReportJob.status == 'running', ReportJob.started_at < stale_before),
+                    db.and_(ReportJob.status == 'awaiting_callback', ReportJob.available_at <= now)
+                )
+            )
+            if saturated:
+                # Stale running jobs are still reclaimed, they already hold one of the batch's slots
+                query = query.filter(db.or_(ReportJob.batch_id.is_(None),
+                                            ReportJob.batch_id.notin_(saturated),
+                                            ReportJob.status.in_(('running', 'awaiting_callback'))))
+            # Over-fetch a little: jobs of a batch that fills up during this claim are skipped
+            candidates = query.order_by(ReportJob.available_at, ReportJob.id).limit(limit * 4) \
+                .with_for_update(skip_locked=True).all()
+
+            missing_limits = {job.batch_id for job in candidates if job.batch_id and job.batch_id not in limits}
+            if missing_limits:
+                limits.update(db.session.query(ReportBatch.id, ReportBatch.max_concurrency)
+                              .filter(ReportBatch.id.in_(missing_limits)).all())
+
+            jobs = []
+            # Jobs given up on, with the error for their report if it is still in flight
+            exhausted = {}
+            for job in candidates:
+                if len(jobs) >= limit:
+                    break
+                if job.status == 'awaiting_callback':
+                    exhausted[job] = 'No result received from the report service'
+                    continue
+                if job.status == 'running' and job.attempts >= self.max_attempts:
+                    # The worker died on its last attempt: give up instead of retrying forever
+                    logging.error(f"Report job {job.id} went stale after {job.attempts} attempts")
+                    job.last_error = 'Worker stopped responding'
+                    exhausted[job] = 'Report generation timed out'
+                    continue
+                if job.batch_id:
+                    if job.status != 'running' and running.get(job.batch_id, 0) >= limits.get(job.batch_id, 1):
+                        continue
+                    if job.status != 'running':
+                        running[job.batch_id] = running.get(job.batch_id, 0) + 1
+                if job.status == 'running':
+                    logging.warning(f"Reclaiming stale report job {job.id}")
+                job.status = 'running'
+                job.attempts += 1
+                job.started_at = now
+                jobs.append(job)
+
+            failed_reports = []
+            if exhausted:
+                # The completion callback may have finalized some of these reports already
+                failed_reports = Report.query.filter(Report.id.in_([job.report_id for job in exhausted]),
+                                                     Report.status.in_(IN_FLIGHT_STATUSES)) \
+                    .with_for_update().all()
+                unsettled = {report.id: report for report in failed_reports}
+                for job, error_message in exhausted.items():
+                    report = unsettled.get(job.report_id)
+                    if report:
+                        report.status = 'failed'
+                        report.error_message = error_message
+                    job.status = 'failed' if report else 'completed'
+                    job.finished_at = now
+
+            db.session.commit()
+
+            if self.events:
+                for report in failed_reports:
+                    self.events.publish_report(report)
+            return [job.id for job in jobs]
+
+    def _run_job(self, job_id):
+        try:
+            with self.app.app_context():
+                self._execute(job_id)
+        except Exception as e:
+            logging.error(f"Report job {job_id} crashed: {str(e)}")
+        finally:
+            with self._active_lock:
+                self._active -= 1
+            self._wakeup.set()
+
+    def _execute(self, job_id):
+        job = db.session.get(ReportJob, job_id)
+        report = db.session.get(Report, job.report_id) if job else None
+        if not job or not report:
+            return
+
+        previous_status = report.status
+        try:
+            self._call_webhook(report)
+            job.status = 'completed'
+            job.last_error = None
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Webhook request for report job {job.id} failed: {str(e)}")
+            db.session.rollback()
+            job.last_error = str(e)
+            if _never_connected(e):
+                # n8n never received the call, so retrying cannot duplicate work
+                if job.attempts < self.max_attempts:
+                    job.status = 'queued'
+                    job.available_at = datetime.utcnow() + timedelta(seconds=self.retry_delay * job.attempts)
+                else:
+                    job.status = 'failed'
+                    self._fail_report(report, 'Report service unreachable')
+            elif self.callbacks_enabled:
+                # n8n may already be running the workflow and will post the result;
+                # the dispatcher fails the report if nothing arrives within stale_after
+                job.status = 'awaiting_callback'
+                job.available_at = datetime.utcnow() + timedelta(seconds=self.stale_after)
+                db.session.refresh(report, with_for_update=True)
+                if report.status == 'pending':
+                    report.status = 'processing'
+            else:
+                job.status = 'failed'
+                self._fail_report(report, 'Report service timed out'
+                                  if isinstance(e, requests.exceptions.Timeout) else str(e))
+        except Exception as e:
+            logging.error(f"Report job {job.id} failed: {str(e)}")
+            db.session.rollback()
+            job.status = 'failed'
+            job.last_error = str(e)
+            self._fail_report(report, str(e))
+
+        if job.status in ('completed', 'failed'):
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+        if self.events and report.status != previous_status:
+            self.events.publish_report(report)
+
+    @property
+    def callbacks_enabled(self):
+        return bool(self.callback_secret and self.callback_base_url)
+
+    def _fail_report(self, report, error_message):
+        """Mark report failed unless the completion callback already settled it; the caller commits"""
+        db.session.refresh(report, with_for_update=True)
+        if report.status not in IN_FLIGHT_STATUSES:
+            logging.info(f"Report {report.id} was already {report.status}, keeping that result")
+            return False
+        report.status = 'failed'
+        report.error_message = error_message
+        return True
+
+    def _call_webhook(self, report):
+        """Call the n8n report webhook for report and store the outcome on it"""
+        webhook_payload = {
+            "nome_azienda": report.company_name,
+            "type": report.report_type
+        }
+        if self.callbacks_enabled:
+            # n8n posts the PDF or a failure reason here when the workflow ends
+            webhook_payload["report_id"] = report.id
+            webhook_payload["callback_url"] = f"{self.callback_base_url}/api/reports/callback/{report.id}"
+            webhook_payload["callback_token"] = callback_token(self.callback_secret, report.id)
+
+        # total bounds connecting plus waiting for the headers; _iter_until bounds the body
+        deadline = time.monotonic() + self.webhook_deadline
+        # Stream the body so large PDFs never sit fully in memory
+        with requests.post(
+                self.webhook_url,
+                json=webhook_payload,
+                timeout=Timeout(total=self.webhook_deadline),
+                stream=True,
+                headers={'Content-Type': 'application/json'}) as webhook_response:
+
+            if webhook_response.status_code != 200:
+                logging.error(f"Webhook call failed: {webhook_response.status_code}")
+                self._fail_report(report, f"Report service returned HTTP {webhook_response.status_code}")
+                report.workflow_id = f"webhook_{report.id}"
+                return
+
+            # Check if response is binary PDF
+            content_type = webhook_response.headers.get('content-type', '')
+            if 'application/pdf' in content_type:
+                # Direct PDF response - file is ready; file_name is the download
+                # name, the bytes are stored under their checksum
+                file_name = report_file_name(report)
+                file_path, file_size, checksum = self.storage.save_response(
+                    webhook_response, chunks=_iter_until(webhook_response, deadline))
+
+                # The completion callback may have finalized the report while the body
+                # streamed in; keep its result (an unreferenced file goes to the orphan sweep)
+                db.session.refresh(report, with_for_update=True)
+                report.workflow_id = f"webhook_{report.id}"
+                if report.status not in IN_FLIGHT_STATUSES:
+                    logging.info(f"Report {report.id} was already {report.status}, ignoring the webhook PDF")
+                    return
+
+                report.status = 'completed'
+                report.file_name = file_name
+                report.file_path = file_path
+                report.file_size = file_size
+                report.checksum = checksum
+            else:
+                # Handle JSON response (processing status). The completion callback
+                # may already have finalized the report, so re-read it under a lock
+                db.session.refresh(report, with_for_update=True)
+                report.workflow_id = f"webhook_{report.id}"
+                if report.status == 'pending':
+                    report.status = 'processing'
+
+    def stats(self):
+        """Return job counts per status and current worker usage"""
+        with self.app.app_context():
+            counts = dict(db.session.query(ReportJob.status, db.func.count(ReportJob.id))
+                          .group_by(ReportJob.status).all())
+        with self._active_lock:
+            active = self._active
+        return {'jobs': counts, 'active_workers': active, 'max_workers': self.max_workers}
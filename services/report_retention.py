@@ -0,0 +1,382 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from models import db, Report
+from services.report_storage import CHUNK_SIZE
+
+# Postgres advisory lock key so only one process runs retention at a time
+RETENTION_LOCK_KEY = 72390214
+
+
+def parse_retention_policies(raw_policies):
+    """Parse the REPORT_RETENTION_POLICIES JSON.
+
+    Maps report_type (or '*' for every other type) to
+    {"archive_after_days": N, "delete_after_days": M}; either may be omitted.
+    Raises ValueError unless every given value is a non-negative number.
+    """
+    if not raw_policies:
+        return {}
+
+    policies = json.loads(raw_policies)
+    if not isinstance(policies, dict):
+        raise ValueError('REPORT_RETENTION_POLICIES must be a JSON object')
+
+    parsed = {}
+    for report_type, policy in policies.items():
+        if not isinstance(policy, dict):
+            raise ValueError(f'Retention policy for {report_type} must be an object')
+        parsed[report_type] = {}
+        for key in ('archive_after_days', 'delete_after_days'):
+            days = policy.get(key)
+            # bool is an int subclass, but true/false are not a number of days
+            if days is not None and (isinstance(days, bool) or not isinstance(days, (int, float)) or days < 0):
+                raise ValueError(f'{key} for {report_type} must be a non-negative number of days')
+            parsed[report_type][key] = days
+    return parsed
+
+
+class ReportArchive:
+    """Cold storage for report PDFs as compressed zip bundles.
+
+    Each bundle <archive_dir>/reports-<timestamp>.zip holds files named by
+    their path relative to the reports directory, so a member restores to
+    exactly the path recorded on the Report rows. A sidecar
+    <bundle>.index.json lists the members with their original and
+    compressed sizes. Report.archived_in holds the bundle name only and is
+    resolved with path_for(), so the archive directory can be spelled
+    differently between runs.
+    """
+
+    def __init__(self, storage, archive_dir='reports/archive', compresslevel=9):
+        self.storage = storage
+        self.archive_dir = archive_dir
+        self.compresslevel = compresslevel
+        self._restore_lock = threading.Lock()
+
+    def path_for(self, bundle):
+        """Path of a bundle from Report.archived_in (older rows hold a full path)"""
+        return os.path.join(self.archive_dir, os.path.basename(bundle))
+
+    def member_name(self, file_path):
+        """Bundle member for a hot file, or None when it lives outside the reports directory"""
+        relative_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(self.storage.reports_dir))
+        if relative_path.startswith('..'):
+            return None
+        return relative_path.replace(os.sep, '/')
+
+    def write_bundle(self, file_paths):
+        """Compress file_paths into a new bundle; returns (bundle_name, archived_paths)"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        bundle_name = f"reports-{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}.zip"
+        bundle_path = os.path.join(self.archive_dir, bundle_name)
+
+        index = []
+        fd, temp_path = tempfile.mkstemp(dir=self.archive_dir, prefix='.bundle-', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as raw, \
+                    zipfile.ZipFile(raw, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as bundle:
+                for file_path in file_paths:
+                    member = self.member_name(file_path)
+                    if not member or not os.path.exists(file_path):
+                        continue
+                    bundle.write(file_path, arcname=member)
+                    info = bundle.getinfo(member)
+                    index.append({
+                        'file_path': file_path,
+                        'member': member,
+                        'size': info.file_size,
+                        'compressed_size': info.compress_size
+                    })
+                bundle.close()
+                raw.flush()
+                os.fsync(raw.fileno())
+
+            if not index:
+                os.unlink(temp_path)
+                return None, []
+
+            os.replace(temp_path, bundle_path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+        with open(f"{bundle_path}.index.json", 'w') as f:
+            json.dump({'bundle': bundle_name, 'created_at': datetime.utcnow().isoformat(), 'files': index}, f, indent=2)
+
+        return bundle_name, [entry['file_path'] for entry in index]
+
+    def restore(self, file_path, bundle):
+        """Extract file_path from the bundle named in Report.archived_in back into hot storage"""
+        bundle_path = self.path_for(bundle)
+        member = self.member_name(file_path)
+        if not member:
+            raise FileNotFoundError(file_path)
+
+        # Concurrent downloads of the same archived report extract it once
+        with self._restore_lock:
+            if os.path.exists(file_path):
+                return file_path
+            with zipfile.ZipFile(bundle_path) as bundle, bundle.open(member) as archived:
+                self.storage.save_chunks(iter(lambda: archived.read(CHUNK_SIZE), b''), file_path=file_path)
+        logging.info(f"Restored {file_path} from {bundle_path}")
+        return file_path
+
+    def bundles(self):
+        """Names of the bundles in the archive directory"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(name for name in os.listdir(self.archive_dir) if name.endswith('.zip'))
+
+    def delete_bundle(self, bundle):
+        bundle_path = self.path_for(bundle)
+        for path in (bundle_path, f"{bundle_path}.index.json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class ReportRetention:
+    """Applies per report_type retention policies to stored PDFs.
+
+    - archive_after_days: files whose reports are all older than this are
+      moved into a compressed bundle and removed from hot storage
+    - delete_after_days: reports older than this are deleted, their files go
+      to the file reaper
+    Every run also removes files and bundles no report refers to.
+    """
+
+    def __init__(self, storage, archive, policies, file_reaper=None, bundle_size=500, orphan_grace=3600):
+        self.storage = storage
+        self.archive = archive
+        self.policies = policies
+        self.file_reaper = file_reaper
+        self.bundle_size = bundle_size
+        self.orphan_grace = orphan_grace
+        self.app = None
+        self._thread = None
+        self.last_run = None
+        self._lock_connection = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def start(self, interval):
+        """Run retention every interval seconds in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run_forever, args=(interval,), name='report-retention', daemon=True)
+        self._thread.start()
+
+    def _run_forever(self, interval):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.run()
+            except Exception as e:
+                logging.error(f"Report retention error: {str(e)}")
+            time.sleep(interval)
+
+    def policy_for(self, report_type):
+        return self.policies.get(report_type) or self.policies.get('*') or {}
+
+    def run(self, dry_run=False):
+        """Apply every policy once; must be called inside an app context"""
+        if not self._acquire_lock():
+            logging.info("Report retention already running in another process")
+            return None
+
+        try:
+            started = time.monotonic()
+            try:
+                summary = {
+                    'expired_reports': self.expire_reports(dry_run),
+                    'archived_files': self.archive_files(dry_run),
+                    'orphaned_files': self.reap_orphaned_files(dry_run),
+                    'orphaned_bundles': self.reap_orphaned_bundles(dry_run),
+                    'dry_run': dry_run
+                }
+                db.session.commit()
+            except Exception:
+                # A failed step can leave the session in an aborted transaction
+                db.session.rollback()
+                raise
+            summary['seconds'] = round(time.monotonic() - started, 2)
+            summary['finished_at'] = datetime.utcnow().isoformat()
+            if not dry_run:
+                self.last_run = summary
+            logging.info(f"Report retention finished: {summary}")
+            return summary
+        finally:
+            self._release_lock()
+
+    def _acquire_lock(self):
+        if db.engine.dialect.name != 'postgresql':
+            return True
+        # Session-level lock on a dedicated connection: commits in between must not release it
+        self._lock_connection = db.engine.connect()
+        acquired = self._lock_connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {'key': RETENTION_LOCK_KEY}).scalar()
+        if not acquired:
+            self._release_lock(locked=False)
+        return acquired
+
+    def _release_lock(self, locked=True):
+        connection = self._lock_connection
+        if connection is None:
+            return
+        try:
+            if locked:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': RETENTION_LOCK_KEY})
+        finally:
+            connection.close()
+            self._lock_connection = None
+
+    def expire_reports(self, dry_run=False):
+        """Delete reports older than their type's delete_after_days"""
+        now = datetime.utcnow()
+        expired = 0
+        report_types = [t for t, _ in db.session.query(Report.report_type, db.func.count(Report.id))
+                        .group_by(Report.report_type).all()]
+
+        for report_type in report_types:
+            days = self.policy_for(report_type).get('delete_after_days')
+            if not days:
+                continue
+            condition = db.and_(Report.report_type == report_type,
+                                Report.created_at < now - timedelta(days=days),
+                                Report.status.in_(('completed', 'failed')))
+            if dry_run:
+                expired += Report.query.filter(condition).count()
+                continue
+
+            deleted = db.session.execute(
+                db.delete(Report).where(condition).returning(Report.file_path),
+                execution_options={'synchronize_session': False}
+            ).all()
+            db.session.commit()
+            expired += len(deleted)
+            if self.file_reaper:
+                self.file_reaper.submit({row.file_path for row in deleted if row.file_path})
+
+        return expired
+
+    def archive_files(self, dry_run=False):
+        """Move files whose reports are all past archive_after_days into bundles"""
+        now = datetime.utcnow()
+        # Hot copies reused by a new report during this run are kept
+        started = time.time()
+        newest_by_file = {}
+        # One row per (file, type): a file is only archived when every report using it is due
+        rows = db.session.query(Report.file_path, Report.report_type, db.func.max(Report.created_at)) \
+            .filter(Report.status == 'completed', Report.file_path.isnot(None)) \
+            .group_by(Report.file_path, Report.report_type).all()
+
+        for file_path, report_type, newest in rows:
+            days = self.policy_for(report_type).get('archive_after_days')
+            due = bool(days) and newest is not None and newest < now - timedelta(days=days)
+            newest_by_file[file_path] = newest_by_file.get(file_path, True) and due
+
+        due_files = [path for path, due in newest_by_file.items() if due and os.path.exists(path)]
+        if dry_run:
+            return len(due_files)
+
+        # Files already in a bundle (e.g. restored by a download) only need evicting again
+        archived_in = dict(db.session.query(Report.file_path, Report.archived_in)
+                           .filter(Report.file_path.in_(due_files), Report.archived_in.isnot(None))
+                           .distinct().all()) if due_files else {}
+        archived_in = {path: os.path.basename(bundle) for path, bundle in archived_in.items()
+                       if os.path.exists(self.archive.path_for(bundle))}
+        if archived_in:
+            # Reports created after the bundle was written still point at the hot copy only
+            for file_path, bundle in archived_in.items():
+                db.session.execute(
+                    db.update(Report).where(Report.file_path == file_path, Report.archived_in.is_(None))
+                    .values(archived_in=bundle),
+                    execution_options={'synchronize_session': False}
+                )
+            db.session.commit()
+            for file_path in archived_in:
+                self.storage.delete_if_untouched(file_path, since=started)
+        # Files whose bundle went missing are bundled again
+        to_bundle = [path for path in due_files if path not in archived_in]
+
+        archived = len(archived_in)
+        for start in range(0, len(to_bundle), self.bundle_size):
+            bundle, bundled = self.archive.write_bundle(to_bundle[start:start + self.bundle_size])
+            if not bundle:
+                continue
+            # Record the bundle before removing hot copies; a crash in between only leaves extra copies
+            db.session.execute(
+                db.update(Report).where(Report.file_path.in_(bundled)).values(archived_in=bundle),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+            for file_path in bundled:
+                self.storage.delete_if_untouched(file_path, since=started)
+            archived += len(bundled)
+            logging.info(f"Archived {len(bundled)} report files into {bundle}")
+
+        return archived
+
+    def reap_orphaned_files(self, dry_run=False):
+        """Delete stored PDFs (and stale partial uploads) that no report refers to"""
+        cutoff = time.time() - self.orphan_grace
+        candidates = []
+        for root, _, names in os.walk(self.storage.reports_dir):
+            for name in names:
+                if not (name.endswith('.pdf') or name.endswith('.part')):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    # Skip recent files: their report row may not be committed yet
+                    if os.path.getmtime(path) > cutoff:
+                        continue
+                except OSError:
+                    continue
+                candidates.append(path)
+
+        orphaned = [path for path in candidates if path.endswith('.part')]
+        pdfs = [path for path in candidates if path.endswith('.pdf')]
+        if pdfs:
+            # Compare absolute paths: rows may hold paths relative to another working directory
+            referenced = {os.path.abspath(row.file_path) for row in db.session.query(Report.file_path)
+                          .filter(Report.file_path.isnot(None)).distinct()}
+            orphaned.extend(path for path in pdfs if os.path.abspath(path) not in referenced)
+
+        if not dry_run:
+            for path in orphaned:
+                self.storage.delete_if_untouched(path, since=cutoff)
+        return len(orphaned)
+
+    def reap_orphaned_bundles(self, dry_run=False):
+        """Delete bundles that no report refers to any more"""
+        bundles = self.archive.bundles()
+        if not bundles:
+            return 0
+
+        # Compare bundle names: older rows hold the full path they were written under
+        referenced = {os.path.basename(row.archived_in) for row in db.session.query(Report.archived_in)
+                      .filter(Report.archived_in.isnot(None)).distinct()}
+        cutoff = time.time() - self.orphan_grace
+        orphaned = [bundle for bundle in bundles
+                    if bundle not in referenced and os.path.getmtime(self.archive.path_for(bundle)) < cutoff]
+        if not dry_run:
+            for bundle in orphaned:
+                self.archive.delete_bundle(bundle)
+        return len(orphaned)
+
+    def stats(self):
+        return {'policies': self.policies, 'last_run': self.last_run}
@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ReportTooLargeError(Exception):
+    """Raised when a report body exceeds the configured size limit"""
+
+
+def report_file_name(report):
+    """User-facing download name for a report PDF"""
+    if report.report_type == 'federterziario_filiera':
+        current_date = datetime.now().strftime('%Y%m%d')
+        return f"Federterziario_filiera_{current_date}.pdf"
+
+    clean_company_name = report.company_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
+    current_date_extended = datetime.now().strftime('%Y%m%d%H%M')
+    return f"{clean_company_name}_{current_date_extended}.pdf"
+
+
+class ReportStorage:
+    """Content-addressed store for report PDFs.
+
+    Files live at <reports_dir>/objects/ab/cd/<sha256>.pdf, so identical PDFs
+    share one file. Bodies are streamed into a temporary file, fsynced and
+    renamed into place, so a crash or an oversized body never leaves a partial
+    PDF under its real name. Several reports can point to the same file; the
+    caller checks references before calling delete(). Background deletes use
+    delete_if_untouched(), which backs off from files that save_chunks() or
+    claim() reused after the delete was requested.
+    """
+
+    def __init__(self, reports_dir='reports', max_file_size=100 * 1024 * 1024):
+        self.reports_dir = reports_dir
+        self.objects_dir = os.path.join(reports_dir, 'objects')
+        self.max_file_size = max_file_size
+        # Serializes reusing an existing file against delete_if_untouched() in
+        # this process only; across processes the mtime touched by claim() is
+        # what keeps a reused file from being deleted
+        self._reuse_lock = threading.Lock()
+        # mkstemp creates 0600 files; keep the permissions open() would give.
+        # The umask can only be read by setting it, so do it once at startup.
+        umask = os.umask(0)
+        os.umask(umask)
+        self._file_mode = 0o666 & ~umask
+
+    def object_path(self, checksum):
+        """Return the storage path for a SHA-256 hex digest"""
+        return os.path.join(self.objects_dir, checksum[:2], checksum[2:4], f"{checksum}.pdf")
+
+    def save_response(self, response, chunks=None):
+        """Stream a requests response opened with stream=True into the store.
+
+        chunks overrides the body iterator, e.g. to enforce a deadline.
+        Returns (file_path, file_size, checksum) where checksum is the SHA-256 hex digest.
+        """
+        content_length = response.headers.get('content-length')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_file_size:
+            raise ReportTooLargeError(f"Report is {content_length} bytes, limit is {self.max_file_size}")
+
+        if chunks is None:
+            chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        return self.save_chunks(chunks)
+
+    def save_stream(self, stream):
+        """Copy a file-like object (upload or request body) into the store"""
+        return self.save_chunks(iter(lambda: stream.read(CHUNK_SIZE), b''))
+
+    def save_chunks(self, chunks, file_path=None):
+        """Write an iterable of byte chunks to the store atomically.
+
+        The file goes to its content address unless file_path is given
+        (used when restoring archived files to their original location).
+        """
+        temp_dir = os.path.dirname(file_path) if file_path else self.objects_dir
+        os.makedirs(temp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        file_size = 0
+        # Same filesystem as the final location so the rename is atomic
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir, prefix='.upload-', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    file_size += len(chunk)
+                    if file_size > self.max_file_size:
+                        raise ReportTooLargeError(f"Report exceeds the {self.max_file_size} byte limit")
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+
+            checksum = digest.hexdigest()
+            if not file_path:
+                file_path = self.object_path(checksum)
+            final_dir = os.path.dirname(file_path)
+            os.makedirs(final_dir, exist_ok=True)
+
+            if self.claim(file_path):
+                # Same content is already stored
+                os.unlink(temp_path)
+                return file_path, file_size, checksum
+
+            os.chmod(temp_path, self._file_mode)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+        self._fsync_dir(final_dir)
+        return file_path, file_size, checksum
+
+    def claim(self, file_path):
+        """Claim an existing file for a new report by touching its mtime.
+
+        Call before committing a report that points at file_path so a delete
+        queued earlier keeps the file. Returns False if the file is gone.
+        """
+        with self._reuse_lock:
+            try:
+                os.utime(file_path)
+                return True
+            except FileNotFoundError:
+                return False
+
+    def exists(self, file_path):
+        return bool(file_path) and os.path.exists(file_path)
+
+    def delete(self, file_path):
+        """Remove a stored file; returns False if it could not be removed"""
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
+            return True
+        except OSError as e:
+            logging.warning(f"Failed to delete file {file_path}: {str(e)}")
+            return False
+
+    def delete_if_untouched(self, file_path, since):
+        """Remove a stored file unless it was claimed after since (a time.time() value).
+
+        The reference check done before queueing a delete can't see a report
+        that is still being created; its save_chunks() or claim() call touched
+        the file, so the file is kept. Returns None when kept,
+        otherwise what delete() returns.
+        """
+        with self._reuse_lock:
+            try:
+                if os.path.getmtime(file_path) >= since:
+                    return None
+            except FileNotFoundError:
+                return True
+            return self.delete(file_path)
+
+    def _fsync_dir(self, path):
+        # Persist the rename itself; not supported on every platform
+        try:
+            dir_fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError as e:
+            logging.debug(f"Could not fsync {path}: {str(e)}")
+        finally:
+            os.close(dir_fd)
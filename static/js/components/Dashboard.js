@@ -17,13 +17,14 @@ const Dashboard = ({ user, showToast }) => {
         try {
             setLoading(true);
 
-            // Load dashboard stats
-            const statsResponse = await apiService.getDashboardStats();
+            // Load dashboard stats and recent reports in one request
+            const statsResponse = await apiService.getDashboardOverview();
             setStats(statsResponse);
+            setRecentReports(statsResponse.recent_reports || []);
 
-            // Load recent reports
-            const reportsResponse = await apiService.getRecentReports();
-            setRecentReports(reportsResponse.recent_reports || []);
+            if (statsResponse.partial) {
+                showToast('Some dashboard data could not be loaded', 'warning');
+            }
 
             // Create charts after data loads
             setTimeout(() => {
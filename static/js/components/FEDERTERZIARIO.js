@@ -254,6 +254,16 @@ const FederterziarioCompanyRelationshipsGraph = ({
     );
 };
 
+// Report types listed in the FEDERTERZIARIO history
+const FEDERTERZIARIO_REPORT_TYPES = "federterziario,federterziario_filiera";
+
+// Company properties the picker searches and shows; details are loaded on selection
+const FEDERTERZIARIO_COMPANY_LIST_FIELDS = [
+    "nome_azienda",
+    "settore",
+    "classificazione_prodotti",
+];
+
 const FEDERTERZIARIO = ({ user, showToast }) => {
     const [companies, setCompanies] = useState([]);
     const [filteredCompanies, setFilteredCompanies] = useState([]);
@@ -261,6 +271,7 @@ const FEDERTERZIARIO = ({ user, showToast }) => {
     const [searchTerm, setSearchTerm] = useState("");
     const [loading, setLoading] = useState(true);
     const [reportHistory, setReportHistory] = useState([]);
+    const [historyCursor, setHistoryCursor] = useState(null);
     const [generatingReport, setGeneratingReport] = useState(false);
     const [isDropdownOpen, setIsDropdownOpen] = useState(false);
     const [selectedReports, setSelectedReports] = useState([]);
@@ -313,26 +324,50 @@ const FEDERTERZIARIO = ({ user, showToast }) => {
         }
     };
 
+    // Live report status updates from the server instead of polling,
+    // kept open only while some report can still change status
+    const hasReportsInFlight = apiService.hasReportsInFlight(reportHistory);
+
+    useEffect(() => {
+        if (!hasReportsInFlight) {
+            return undefined;
+        }
+        const unsubscribe = apiService.subscribeReportEvents((event) => {
+            setReportHistory((prev) =>
+                prev.map((report) =>
+                    report.id === event.report_id
+                        ? {
+                              ...report,
+                              status: event.status,
+                              file_name: event.file_name,
+                              error_message: event.error_message,
+                          }
+                        : report,
+                ),
+            );
+        });
+        return unsubscribe;
+    }, [hasReportsInFlight]);
+
     const loadData = async () => {
         try {
             safeSetState(setLoading, true);
 
-            // Load FEDERTERZIARIO companies from Neo4j
-            const companiesResponse =
-                await apiService.getFederterziarioCompaniesForReports();
-            safeSetState(setCompanies, companiesResponse.companies || []);
+            // Load FEDERTERZIARIO companies from Neo4j, showing each page as it arrives
+            safeSetState(setCompanies, []);
+            await apiService.loadCompanyPages(
+                (params) => apiService.getFederterziarioCompaniesForReports(params),
+                FEDERTERZIARIO_COMPANY_LIST_FIELDS,
+                (page) => safeSetState(setCompanies, (prev) => [...prev, ...page]),
+            );
 
             // Load user's report history (FEDERTERZIARIO and filiera reports)
-            const historyResponse = await apiService.getReportHistory();
-            const allReports = historyResponse.reports || [];
-            
-            // Filter for FEDERTERZIARIO related reports
-            const federterziarioReports = allReports.filter(report => 
-                report.report_type === 'federterziario' || 
-                report.report_type === 'federterziario_filiera'
+            const historyResponse = await apiService.getReportHistory(
+                FEDERTERZIARIO_REPORT_TYPES,
+                { limit: apiService.historyPageSize },
             );
-            
-            safeSetState(setReportHistory, federterziarioReports);
+            safeSetState(setReportHistory, historyResponse.reports || []);
+            safeSetState(setHistoryCursor, historyResponse.next_cursor || null);
         } catch (error) {
             console.error("Error loading FEDERTERZIARIO data:", error);
             if (mountedRef.current) {
@@ -429,21 +464,31 @@ const FEDERTERZIARIO = ({ user, showToast }) => {
     const loadReportHistory = async () => {
         try {
             // Load both federterziario and federterziario_filiera reports
-            const historyResponse = await apiService.getReportHistory();
-            const allReports = historyResponse.reports || [];
-            
-            // Filter for FEDERTERZIARIO related reports
-            const federterziarioReports = allReports.filter(report => 
-                report.report_type === 'federterziario' || 
-                report.report_type === 'federterziario_filiera'
+            const historyResponse = await apiService.getReportHistory(
+                FEDERTERZIARIO_REPORT_TYPES,
+                { limit: apiService.historyPageSize },
             );
-            
-            setReportHistory(federterziarioReports);
+            setReportHistory(historyResponse.reports || []);
+            setHistoryCursor(historyResponse.next_cursor || null);
         } catch (error) {
             console.error("Error loading report history:", error);
         }
     };
 
+    const loadMoreReports = async () => {
+        if (!historyCursor) return;
+        try {
+            const historyResponse = await apiService.getReportHistory(
+                FEDERTERZIARIO_REPORT_TYPES,
+                { limit: apiService.historyPageSize, cursor: historyCursor },
+            );
+            setReportHistory((prev) => [...prev, ...(historyResponse.reports || [])]);
+            setHistoryCursor(historyResponse.next_cursor || null);
+        } catch (error) {
+            console.error("Error loading more reports:", error);
+        }
+    };
+
     const downloadReport = async (reportId) => {
         try {
             await apiService.downloadReport(reportId);
@@ -1308,6 +1353,16 @@ const FEDERTERZIARIO = ({ user, showToast }) => {
                         </tbody>
                     </table>
                 </div>
+                {historyCursor && (
+                    <div className="px-6 py-3 border-t border-gray-200 text-center">
+                        <button
+                            onClick={loadMoreReports}
+                            className="text-blue-600 hover:text-blue-800 text-sm font-medium"
+                        >
+                            Load more
+                        </button>
+                    </div>
+                )}
             </div>
 
             {/* Relationship Details Modal */}
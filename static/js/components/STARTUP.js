@@ -249,6 +249,9 @@ const CompanyRelationshipsGraph = ({ companyName, onRelationshipClick }) => {
     );
 };
 
+// Company properties the picker searches and shows; details are loaded on selection
+const STARTUP_COMPANY_LIST_FIELDS = ['nome_azienda', 'tipologia_attivita'];
+
 const STARTUP = ({ user, showToast }) => {
     const [companies, setCompanies] = useState([]);
     const [filteredCompanies, setFilteredCompanies] = useState([]);
@@ -256,6 +259,7 @@ const STARTUP = ({ user, showToast }) => {
     const [searchTerm, setSearchTerm] = useState('');
     const [loading, setLoading] = useState(true);
     const [reportHistory, setReportHistory] = useState([]);
+    const [historyCursor, setHistoryCursor] = useState(null);
     const [generatingReport, setGeneratingReport] = useState(false);
     const [isDropdownOpen, setIsDropdownOpen] = useState(false);
     const [showRelationshipModal, setShowRelationshipModal] = useState(false);
@@ -320,15 +324,41 @@ const STARTUP = ({ user, showToast }) => {
         }
     };
 
+    // Live report status updates from the server instead of polling,
+    // kept open only while some report can still change status
+    const hasReportsInFlight = apiService.hasReportsInFlight(reportHistory);
+
+    useEffect(() => {
+        if (!hasReportsInFlight) {
+            return undefined;
+        }
+        const unsubscribe = apiService.subscribeReportEvents((event) => {
+            setReportHistory(prev => 
+                prev.map(report => 
+                    report.id === event.report_id 
+                        ? { ...report, status: event.status, file_name: event.file_name, error_message: event.error_message }
+                        : report
+                )
+            );
+        });
+        return unsubscribe;
+    }, [hasReportsInFlight]);
+
     const loadData = async () => {
         try {
             safeSetState(setLoading, true);
 
-            const companiesResponse = await apiService.getStartupCompaniesForReports();
-            safeSetState(setCompanies, companiesResponse.companies || []);
+            // Show each page of companies as it arrives
+            safeSetState(setCompanies, []);
+            await apiService.loadCompanyPages(
+                (params) => apiService.getStartupCompaniesForReports(params),
+                STARTUP_COMPANY_LIST_FIELDS,
+                (page) => safeSetState(setCompanies, prev => [...prev, ...page])
+            );
 
-            const historyResponse = await apiService.getReportHistory('startup');
+            const historyResponse = await apiService.getReportHistory('startup', { limit: apiService.historyPageSize });
             safeSetState(setReportHistory, historyResponse.reports || []);
+            safeSetState(setHistoryCursor, historyResponse.next_cursor || null);
 
         } catch (error) {
             console.error('Error loading STARTUP data:', error);
@@ -340,10 +370,24 @@ const STARTUP = ({ user, showToast }) => {
         }
     };
 
+    // The company list only carries STARTUP_COMPANY_LIST_FIELDS, so fetch the full record
+    const loadCompanyDetails = async (company) => {
+        try {
+            const detailsResponse = await apiService.getStartupCompanyDetails(company.nome_azienda);
+            if (detailsResponse.company) {
+                safeSetState(setSelectedCompany, detailsResponse.company);
+            }
+        } catch (error) {
+            console.error('Error loading company details:', error);
+            // Keep the basic company info if detailed loading fails
+        }
+    };
+
     const handleCompanySelect = (company) => {
         setSelectedCompany(company);
         setSearchTerm(company.nome_azienda);
         setIsDropdownOpen(false);
+        loadCompanyDetails(company);
     };
 
     const handleCompanySelectionFromChatInternal = async (companyName) => {
@@ -361,6 +405,7 @@ const STARTUP = ({ user, showToast }) => {
                 setSelectedCompany(company);
                 setSearchTerm(companyName);
                 setIsDropdownOpen(false);
+                loadCompanyDetails(company);
                 
                 // Show a notification
                 if (showToast) {
@@ -417,13 +462,25 @@ const STARTUP = ({ user, showToast }) => {
 
     const loadReportHistory = async () => {
         try {
-            const historyResponse = await apiService.getReportHistory('startup');
+            const historyResponse = await apiService.getReportHistory('startup', { limit: apiService.historyPageSize });
             setReportHistory(historyResponse.reports || []);
+            setHistoryCursor(historyResponse.next_cursor || null);
         } catch (error) {
             console.error('Error loading report history:', error);
         }
     };
 
+    const loadMoreReports = async () => {
+        if (!historyCursor) return;
+        try {
+            const historyResponse = await apiService.getReportHistory('startup', { limit: apiService.historyPageSize, cursor: historyCursor });
+            setReportHistory(prev => [...prev, ...(historyResponse.reports || [])]);
+            setHistoryCursor(historyResponse.next_cursor || null);
+        } catch (error) {
+            console.error('Error loading more reports:', error);
+        }
+    };
+
     const downloadReport = async (reportId) => {
         try {
             await apiService.downloadReport(reportId);
@@ -1047,6 +1104,16 @@ const STARTUP = ({ user, showToast }) => {
                         </tbody>
                     </table>
                 </div>
+                {historyCursor && (
+                    <div className="px-6 py-3 border-t border-gray-200 text-center">
+                        <button
+                            onClick={loadMoreReports}
+                            className="text-blue-600 hover:text-blue-800 text-sm font-medium"
+                        >
+                            Load more
+                        </button>
+                    </div>
+                )}
             </div>
 
             {/* Delete Confirmation Modal */}
@@ -10,6 +10,8 @@ const STARTUPChat = ({ user }) => {
     const [showHistory, setShowHistory] = useState(false);
     const [editingTitleId, setEditingTitleId] = useState(null);
     const [editingTitleValue, setEditingTitleValue] = useState('');
+    const [historyCursor, setHistoryCursor] = useState(null);
+    const [loadingMoreHistory, setLoadingMoreHistory] = useState(false);
     const [regions, setRegions] = useState([]);
     const [provinces, setProvinces] = useState([]);
     const [selectedRegion, setSelectedRegion] = useState('');
@@ -79,12 +81,12 @@ const STARTUPChat = ({ user }) => {
                           window.currentUser?.user_id || 
                           localStorage.getItem('currentUserId') || 
                           'anonymous';
-            
-            const response = await apiService.getStartupChatHistory(userId);
-            
-            if (response.success && response.history) {
-                const conversations = groupMessagesIntoConversations(response.history);
+            const response = await apiService.getStartupChatHistory(userId, { limit: apiService.chatHistoryPageSize });
+
+            if (response.success && response.conversations) {
+                const conversations = response.conversations;
                 setChatHistory(conversations);
+                setHistoryCursor(response.next_cursor);
 
                 if (conversations.length > 0 && !selectedConversation) {
                     setSelectedConversation(conversations[0]);
@@ -96,92 +98,40 @@ const STARTUPChat = ({ user }) => {
         }
     };
 
-    const groupMessagesIntoConversations = (history) => {
-        if (!history || !Array.isArray(history)) {
-            return [];
-        }
-        
-        if (history.length === 0) {
-            return [];
-        }
+    // Fetch the next page of older conversations
+    const loadMoreHistory = async () => {
+        if (!historyCursor || loadingMoreHistory) return;
 
-        // Sort all messages by timestamp first
-        const sortedHistory = [...history].sort((a, b) => 
-            new Date(a.timestamp) - new Date(b.timestamp)
-        );
-
-        const userMessages = sortedHistory.filter(msg => msg.message_type === 'user');
-        const assistantMessages = sortedHistory.filter(msg => msg.message_type === 'assistant');
-
-        const conversations = [];
-        let currentConversation = null;
-
-        // If we only have assistant messages, create artificial conversations
-        if (userMessages.length === 0 && assistantMessages.length > 0) {
-            assistantMessages.forEach((msg, index) => {
-                const conversation = {
-                    id: `conv_artificial_${index}_${Date.now()}`,
-                    title: `Conversazione ${index + 1}`,
-                    timestamp: msg.timestamp,
-                    messages: [
-                        {
-                            content: 'Conversazione ripristinata dalla cronologia',
-                            message_type: 'user',
-                            timestamp: msg.timestamp
-                        },
-                        msg
-                    ]
-                };
-                conversations.push(conversation);
-            });
-        } else {
-            // Normal grouping logic
-            sortedHistory.forEach((msg, index) => {
-                if (msg.message_type === 'user') {
-                    if (currentConversation) {
-                        // Sort messages in the current conversation before pushing
-                        currentConversation.messages.sort((a, b) => 
-                            new Date(a.timestamp) - new Date(b.timestamp)
-                        );
-                        conversations.push(currentConversation);
-                    }
-                    
-                    // Check if message has custom title
-                    let title = msg.content.substring(0, 50) + (msg.content.length > 50 ? '...' : '');
-                    let actualContent = msg.content;
-                    
-                    if (msg.content.startsWith('CUSTOM_TITLE:')) {
-                        const parts = msg.content.split('|', 2);
-                        if (parts.length > 1) {
-                            title = parts[0].replace('CUSTOM_TITLE:', '');
-                            actualContent = parts[1];
-                        }
-                    }
-                    
-                    currentConversation = {
-                        id: `conv_${index}_${Date.now()}`,
-                        title: title,
-                        timestamp: msg.timestamp,
-                        messages: [{
-                            ...msg,
-                            content: actualContent
-                        }]
-                    };
-                } else if (currentConversation && msg.message_type === 'assistant') {
-                    currentConversation.messages.push(msg);
-                }
+        try {
+            setLoadingMoreHistory(true);
+            const userId = user?.id || 
+                          user?.user_id || 
+                          window.currentUser?.id || 
+                          window.currentUser?.user_id || 
+                          localStorage.getItem('currentUserId') || 
+                          'anonymous';
+            const response = await apiService.getStartupChatHistory(userId, {
+                limit: apiService.chatHistoryPageSize,
+                before: historyCursor
             });
 
-            if (currentConversation) {
-                // Sort messages in the final conversation
-                currentConversation.messages.sort((a, b) => 
-                    new Date(a.timestamp) - new Date(b.timestamp)
-                );
-                conversations.push(currentConversation);
+            if (response.success && response.conversations) {
+                setChatHistory(prev => [...prev, ...response.conversations]);
+                setHistoryCursor(response.next_cursor);
             }
+        } catch (error) {
+            console.error('Failed to load older STARTUP chat history:', error);
+        } finally {
+            setLoadingMoreHistory(false);
+        }
+    };
+
+    // Load older conversations when the sidebar is scrolled near its end
+    const handleHistoryScroll = (e) => {
+        const { scrollTop, scrollHeight, clientHeight } = e.currentTarget;
+        if (scrollHeight - scrollTop - clientHeight < 100) {
+            loadMoreHistory();
         }
-        
-        return conversations.reverse();
     };
 
     const transformMessages = (conversationMessages) => {
@@ -234,27 +184,9 @@ const STARTUPChat = ({ user }) => {
                           localStorage.getItem('currentUserId') || 
                           'anonymous';
             
-            if (!conversation.messages || conversation.messages.length === 0) {
-                alert('Conversazione non valida: nessun messaggio trovato');
-                return;
-            }
+            console.log('Deleting STARTUP conversation:', { userId, conversationId: conversation.id });
 
-            // Sort messages by timestamp to ensure correct order
-            const sortedMessages = [...conversation.messages].sort((a, b) => 
-                new Date(a.timestamp) - new Date(b.timestamp)
-            );
-
-            const startTimestamp = sortedMessages[0].timestamp;
-            const endTimestamp = sortedMessages[sortedMessages.length - 1].timestamp;
-
-            console.log('Deleting STARTUP conversation:', {
-                userId,
-                startTimestamp,
-                endTimestamp,
-                messagesCount: conversation.messages.length
-            });
-
-            const response = await apiService.deleteStartupConversation(userId, startTimestamp, endTimestamp);
+            const response = await apiService.deleteStartupConversation(userId, conversation.id);
 
             if (response.success) {
                 setChatHistory(prev => prev.filter(conv => conv.id !== conversation.id));
@@ -290,12 +222,6 @@ const STARTUPChat = ({ user }) => {
             return;
         }
 
-        const conversation = chatHistory.find(conv => conv.id === conversationId);
-        if (!conversation || !conversation.messages || conversation.messages.length === 0) {
-            cancelEditingTitle();
-            return;
-        }
-
         try {
             const userId = user?.id || 
                           user?.user_id || 
@@ -304,13 +230,7 @@ const STARTUPChat = ({ user }) => {
                           localStorage.getItem('currentUserId') || 
                           'anonymous';
             
-            const sortedMessages = [...conversation.messages].sort((a, b) => 
-                new Date(a.timestamp) - new Date(b.timestamp)
-            );
-            const startTimestamp = sortedMessages[0].timestamp;
-            const endTimestamp = sortedMessages[sortedMessages.length - 1].timestamp;
-
-            await apiService.updateStartupConversationTitle(userId, startTimestamp, endTimestamp, editingTitleValue.trim());
+            await apiService.updateStartupConversationTitle(userId, conversationId, editingTitleValue.trim());
 
             setChatHistory(prev => prev.map(conv => 
                 conv.id === conversationId 
@@ -366,7 +286,8 @@ const STARTUPChat = ({ user }) => {
                 userMessage.content, 
                 userId,
                 selectedRegion,
-                selectedProvince
+                selectedProvince,
+                selectedConversation?.id
             );
 
             if (response && (response.prodotti_soluzioni_esistenti || response.potenziali_fornitori)) {
@@ -378,6 +299,16 @@ const STARTUPChat = ({ user }) => {
                 };
                 setMessages(prev => [...prev, assistantMessage]);
 
+                // Follow-up messages continue the conversation the server started
+                if (!selectedConversation && response.conversation_id) {
+                    setSelectedConversation({
+                        id: response.conversation_id,
+                        title: userMessage.content.substring(0, 50),
+                        timestamp: userMessage.timestamp,
+                        messages: []
+                    });
+                }
+
                 setTimeout(() => {
                     loadChatHistory();
                 }, 1000);
@@ -558,7 +489,7 @@ const STARTUPChat = ({ user }) => {
                 </div>
 
                 {/* Conversations List */}
-                <div className="flex-1 overflow-y-auto p-2">
+                <div className="flex-1 overflow-y-auto p-2" onScroll={handleHistoryScroll}>
                     {chatHistory.length === 0 ? (
                         <div className="text-center text-gray-500 mt-8">
                             <svg className="w-8 h-8 mx-auto mb-2" fill="none" stroke="currentColor" viewBox="0 0 24 24">
@@ -665,6 +596,16 @@ const STARTUPChat = ({ user }) => {
                                     </div>
                                 </div>
                             ))}
+                            {loadingMoreHistory ? (
+                                <p className="text-center text-xs text-gray-500 py-2">Caricamento...</p>
+                            ) : historyCursor && (
+                                <button
+                                    onClick={loadMoreHistory}
+                                    className="w-full text-center text-xs text-blue-600 hover:text-blue-800 py-2"
+                                >
+                                    Carica conversazioni precedenti
+                                </button>
+                            )}
                         </div>
                     )}
                 </div>
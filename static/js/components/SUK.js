@@ -204,6 +204,9 @@ const CompanyRelationshipsGraph = ({ companyName, onRelationshipClick }) => {
     );
 };
 
+// Company properties the picker searches and shows; details are loaded on selection
+const SUK_COMPANY_LIST_FIELDS = ['nome_azienda', 'settore'];
+
 const SUK = ({ user, showToast }) => {
     const [companies, setCompanies] = useState([]);
     const [filteredCompanies, setFilteredCompanies] = useState([]);
@@ -211,6 +214,7 @@ const SUK = ({ user, showToast }) => {
     const [searchTerm, setSearchTerm] = useState('');
     const [loading, setLoading] = useState(true);
     const [reportHistory, setReportHistory] = useState([]);
+    const [historyCursor, setHistoryCursor] = useState(null);
     const [generatingReport, setGeneratingReport] = useState(false);
     const [isDropdownOpen, setIsDropdownOpen] = useState(false);
     const [showRelationshipModal, setShowRelationshipModal] = useState(false);
@@ -277,17 +281,42 @@ const SUK = ({ user, showToast }) => {
         }
     };
 
+    // Live report status updates from the server instead of polling,
+    // kept open only while some report can still change status
+    const hasReportsInFlight = apiService.hasReportsInFlight(reportHistory);
+
+    useEffect(() => {
+        if (!hasReportsInFlight) {
+            return undefined;
+        }
+        const unsubscribe = apiService.subscribeReportEvents((event) => {
+            setReportHistory(prev => 
+                prev.map(report => 
+                    report.id === event.report_id 
+                        ? { ...report, status: event.status, file_name: event.file_name, error_message: event.error_message }
+                        : report
+                )
+            );
+        });
+        return unsubscribe;
+    }, [hasReportsInFlight]);
+
     const loadData = async () => {
         try {
             safeSetState(setLoading, true);
 
-            // Load companies from Neo4j
-            const companiesResponse = await apiService.getCompaniesForReports();
-            safeSetState(setCompanies, companiesResponse.companies || []);
+            // Load companies from Neo4j, showing each page as it arrives
+            safeSetState(setCompanies, []);
+            await apiService.loadCompanyPages(
+                (params) => apiService.getCompaniesForReports(params),
+                SUK_COMPANY_LIST_FIELDS,
+                (page) => safeSetState(setCompanies, prev => [...prev, ...page])
+            );
 
             // Load user's report history (SUK only)
-            const historyResponse = await apiService.getReportHistory('suk');
+            const historyResponse = await apiService.getReportHistory('suk', { limit: apiService.historyPageSize });
             safeSetState(setReportHistory, historyResponse.reports || []);
+            safeSetState(setHistoryCursor, historyResponse.next_cursor || null);
 
         } catch (error) {
             console.error('Error loading SUK data:', error);
@@ -299,10 +328,25 @@ const SUK = ({ user, showToast }) => {
         }
     };
 
+    // The company list only carries SUK_COMPANY_LIST_FIELDS, so fetch the full record
+    const loadCompanyDetails = async (company) => {
+        try {
+            const detailsResponse = await apiService.getCompanyDetailsBatch([company.nome_azienda], 'suk');
+            const details = (detailsResponse.companies || {})[company.nome_azienda];
+            if (details) {
+                safeSetState(setSelectedCompany, details);
+            }
+        } catch (error) {
+            console.error('Error loading company details:', error);
+            // Keep the basic company info if detailed loading fails
+        }
+    };
+
     const handleCompanySelect = (company) => {
         setSelectedCompany(company);
         setSearchTerm(company.nome_azienda);
         setIsDropdownOpen(false);
+        loadCompanyDetails(company);
     };
 
     const handleCompanySelectionFromChat = async (companyName) => {
@@ -320,6 +364,7 @@ const SUK = ({ user, showToast }) => {
                 setSelectedCompany(company);
                 setSearchTerm(companyName);
                 setIsDropdownOpen(false);
+                loadCompanyDetails(company);
                 
                 // Show a notification
                 if (window.showToast) {
@@ -378,13 +423,25 @@ const SUK = ({ user, showToast }) => {
 
     const loadReportHistory = async () => {
         try {
-            const historyResponse = await apiService.getReportHistory('suk');
+            const historyResponse = await apiService.getReportHistory('suk', { limit: apiService.historyPageSize });
             setReportHistory(historyResponse.reports || []);
+            setHistoryCursor(historyResponse.next_cursor || null);
         } catch (error) {
             console.error('Error loading report history:', error);
         }
     };
 
+    const loadMoreReports = async () => {
+        if (!historyCursor) return;
+        try {
+            const historyResponse = await apiService.getReportHistory('suk', { limit: apiService.historyPageSize, cursor: historyCursor });
+            setReportHistory(prev => [...prev, ...(historyResponse.reports || [])]);
+            setHistoryCursor(historyResponse.next_cursor || null);
+        } catch (error) {
+            console.error('Error loading more reports:', error);
+        }
+    };
+
     const downloadReport = async (reportId) => {
         try {
             await apiService.downloadReport(reportId);
@@ -1345,6 +1402,16 @@ const SUK = ({ user, showToast }) => {
                         </tbody>
                     </table>
                 </div>
+                {historyCursor && (
+                    <div className="px-6 py-3 border-t border-gray-200 text-center">
+                        <button
+                            onClick={loadMoreReports}
+                            className="text-blue-600 hover:text-blue-800 text-sm font-medium"
+                        >
+                            Load more
+                        </button>
+                    </div>
+                )}
             </div>
 
             {/* Delete Confirmation Modal */}
@@ -11,6 +11,8 @@ const SUKChat = () => {
     const [showHistory, setShowHistory] = useState(false);
     const [editingTitleId, setEditingTitleId] = useState(null);
     const [editingTitleValue, setEditingTitleValue] = useState('');
+    const [historyCursor, setHistoryCursor] = useState(null);
+    const [loadingMoreHistory, setLoadingMoreHistory] = useState(false);
     const messagesEndRef = useRef(null);
 
     // Scroll to bottom when new messages are added
@@ -32,15 +34,13 @@ const SUKChat = () => {
     const loadChatHistory = async () => {
         try {
             const userId = window.currentUser?.id || 'anonymous';
-            console.log('Loading chat history for user:', userId);
-            const response = await apiService.getChatHistory(userId);
-            console.log('Chat history response:', response);
-            if (response.success && response.history) {
-                // Group messages by conversation (simplified: group consecutive messages)
-                const conversations = groupMessagesIntoConversations(response.history);
+            const response = await apiService.getChatHistory(userId, { limit: apiService.chatHistoryPageSize });
+
+            if (response.success && response.conversations) {
+                const conversations = response.conversations;
                 setChatHistory(conversations);
-                
-                // If no conversation is selected, show the latest one
+                setHistoryCursor(response.next_cursor);
+
                 if (conversations.length > 0 && !selectedConversation) {
                     setSelectedConversation(conversations[0]);
                     setMessages(transformMessages(conversations[0].messages));
@@ -51,50 +51,35 @@ const SUKChat = () => {
         }
     };
 
-    const groupMessagesIntoConversations = (history) => {
-        const conversations = [];
-        let currentConversation = null;
-        
-        history.forEach((msg, index) => {
-            if (msg.message_type === 'user') {
-                // Start a new conversation with user message
-                if (currentConversation) {
-                    conversations.push(currentConversation);
-                }
-
-                // Check if message has custom title
-                let title = msg.content.substring(0, 50) + (msg.content.length > 50 ? '...' : '');
-                let actualContent = msg.content;
-                
-                if (msg.content.startsWith('CUSTOM_TITLE:')) {
-                    const parts = msg.content.split('|', 2);
-                    if (parts.length > 1) {
-                        title = parts[0].replace('CUSTOM_TITLE:', '');
-                        actualContent = parts[1];
-                    }
-                }
+    // Fetch the next page of older conversations
+    const loadMoreHistory = async () => {
+        if (!historyCursor || loadingMoreHistory) return;
 
-                currentConversation = {
-                    id: `conv_${index}`,
-                    title: title,
-                    timestamp: msg.timestamp,
-                    messages: [{
-                        ...msg,
-                        content: actualContent
-                    }]
-                };
-            } else if (currentConversation) {
-                // Add assistant message to current conversation
-                currentConversation.messages.push(msg);
+        try {
+            setLoadingMoreHistory(true);
+            const userId = window.currentUser?.id || 'anonymous';
+            const response = await apiService.getChatHistory(userId, {
+                limit: apiService.chatHistoryPageSize,
+                before: historyCursor
+            });
+
+            if (response.success && response.conversations) {
+                setChatHistory(prev => [...prev, ...response.conversations]);
+                setHistoryCursor(response.next_cursor);
             }
-        });
-        
-        // Add the last conversation
-        if (currentConversation) {
-            conversations.push(currentConversation);
+        } catch (error) {
+            console.error('Failed to load older chat history:', error);
+        } finally {
+            setLoadingMoreHistory(false);
+        }
+    };
+
+    // Load older conversations when the sidebar is scrolled near its end
+    const handleHistoryScroll = (e) => {
+        const { scrollTop, scrollHeight, clientHeight } = e.currentTarget;
+        if (scrollHeight - scrollTop - clientHeight < 100) {
+            loadMoreHistory();
         }
-        
-        return conversations.reverse(); // Latest first
     };
 
     const transformMessages = (conversationMessages) => {
@@ -139,10 +124,7 @@ const SUKChat = () => {
 
         try {
             const userId = window.currentUser?.id || 'anonymous';
-            const startTimestamp = conversation.messages[0].timestamp;
-            const endTimestamp = conversation.messages[conversation.messages.length - 1].timestamp;
-
-            const response = await apiService.deleteConversation(userId, startTimestamp, endTimestamp);
+            const response = await apiService.deleteConversation(userId, conversation.id);
             
             if (response.success) {
                 // Remove conversation from history
@@ -178,21 +160,9 @@ const SUKChat = () => {
             return;
         }
 
-        const conversation = chatHistory.find(conv => conv.id === conversationId);
-        if (!conversation || !conversation.messages || conversation.messages.length === 0) {
-            cancelEditingTitle();
-            return;
-        }
-
         try {
             const userId = window.currentUser?.id || 'anonymous';
-            const sortedMessages = [...conversation.messages].sort((a, b) => 
-                new Date(a.timestamp) - new Date(b.timestamp)
-            );
-            const startTimestamp = sortedMessages[0].timestamp;
-            const endTimestamp = sortedMessages[sortedMessages.length - 1].timestamp;
-
-            await apiService.updateConversationTitle(userId, startTimestamp, endTimestamp, editingTitleValue.trim());
+            await apiService.updateConversationTitle(userId, conversationId, editingTitleValue.trim());
 
             setChatHistory(prev => prev.map(conv => 
                 conv.id === conversationId 
@@ -242,7 +212,8 @@ const SUKChat = () => {
             const userId = window.currentUser?.id || 'anonymous';
             const response = await apiService.sendChatMessage(
                 userMessage.content, 
-                userId
+                userId,
+                selectedConversation?.id
             );
 
             if (response && (response.prodotti_soluzioni_esistenti || response.potenziali_fornitori)) {
@@ -254,6 +225,16 @@ const SUKChat = () => {
                     timestamp: response.timestamp || new Date().toISOString()
                 };
                 setMessages(prev => [...prev, assistantMessage]);
+
+                // Follow-up messages continue the conversation the server started
+                if (!selectedConversation && response.conversation_id) {
+                    setSelectedConversation({
+                        id: response.conversation_id,
+                        title: userMessage.content.substring(0, 50),
+                        timestamp: userMessage.timestamp,
+                        messages: []
+                    });
+                }
                 
                 // Reload history to include new messages
                 setTimeout(() => {
@@ -437,7 +418,7 @@ const SUKChat = () => {
                 </div>
 
                 {/* Conversations List */}
-                <div className="flex-1 overflow-y-auto p-2">
+                <div className="flex-1 overflow-y-auto p-2" onScroll={handleHistoryScroll}>
                     {chatHistory.length === 0 ? (
                         <div className="text-center text-gray-500 mt-8">
                             <svg className="w-8 h-8 mx-auto mb-2" fill="none" stroke="currentColor" viewBox="0 0 24 24">
@@ -543,6 +524,16 @@ const SUKChat = () => {
                                     </div>
                                 </div>
                             ))}
+                            {loadingMoreHistory ? (
+                                <p className="text-center text-xs text-gray-500 py-2">Caricamento...</p>
+                            ) : historyCursor && (
+                                <button
+                                    onClick={loadMoreHistory}
+                                    className="w-full text-center text-xs text-blue-600 hover:text-blue-800 py-2"
+                                >
+                                    Carica conversazioni precedenti
+                                </button>
+                            )}
                         </div>
                     )}
                 </div>
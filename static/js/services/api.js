@@ -32,6 +32,19 @@ const apiService = {
         }
     },
 
+    // Build a query string from an object, skipping empty values
+    // e.g. { limit: 50, after: 'Acme', fields: 'nome_azienda,settore' }
+    buildQuery(params = {}) {
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== null && value !== '') {
+                query.append(key, Array.isArray(value) ? value.join(',') : value);
+            }
+        });
+        const queryString = query.toString();
+        return queryString ? `?${queryString}` : '';
+    },
+
     // Authentication methods
     async login(credentials) {
         return await this.request('/login', {
@@ -62,8 +75,13 @@ const apiService = {
         return await this.request('/dashboard/stats');
     },
 
-    async getCompanies() {
-        return await this.request('/dashboard/companies');
+    // Stats and recent reports in a single request
+    async getDashboardOverview() {
+        return await this.request('/dashboard/overview');
+    },
+
+    async getCompanies(params = {}) {
+        return await this.request(`/dashboard/companies${this.buildQuery(params)}`);
     },
 
     async getSectors() {
@@ -85,6 +103,22 @@ const apiService = {
         });
     },
 
+    // Generate reports for many companies at once: { companies: [...] } or { sector: '...' }
+    async generateBulkReports({ companies = null, sector = null, type = 'suk', maxConcurrency = null } = {}) {
+        const body = { type };
+        if (companies) body.companies = companies;
+        if (sector) body.sector = sector;
+        if (maxConcurrency) body.max_concurrency = maxConcurrency;
+        return await this.request('/reports/generate-bulk', {
+            method: 'POST',
+            body,
+        });
+    },
+
+    async getReportBatch(batchId) {
+        return await this.request(`/reports/batches/${batchId}`);
+    },
+
     async getReportStatus(reportId) {
         return await this.request(`/reports/status/${reportId}`);
     },
@@ -127,31 +161,92 @@ const apiService = {
     },
 
     viewReport: async (reportId) => {
-        const response = await fetch(`/api/reports/view/${reportId}`, {
-            method: 'GET',
+        const url = `/api/reports/view/${reportId}`;
+
+        // HEAD only checks availability; the viewer then loads the PDF itself
+        // and can fetch byte ranges instead of the whole file
+        const response = await fetch(url, {
+            method: 'HEAD',
             credentials: 'include'
         });
 
         if (!response.ok) {
-            const error = await response.json();
-            throw new Error(error.error || 'Failed to view report');
+            throw new Error(response.status === 404 ? 'Report not found' : 'Failed to view report');
         }
 
-        // Create a blob URL and open in new tab
-        const blob = await response.blob();
-        const url = window.URL.createObjectURL(blob);
         window.open(url, '_blank');
 
         return { success: true };
     },
 
-    async getReportHistory(reportType = null) {
-        const url = reportType ? `/reports/history?type=${encodeURIComponent(reportType)}` : '/reports/history';
-        return await this.request(url);
+    // Statuses a report can still change from; mirrors IN_FLIGHT_STATUSES on the server
+    inFlightStatuses: ['pending', 'processing'],
+
+    hasReportsInFlight(reports) {
+        return (reports || []).some(report => this.inFlightStatuses.includes(report.status));
+    },
+
+    // Push channel for report status changes; returns a function that closes it.
+    // onReport receives { report_id, status, file_name, error_message, ... }
+    // Each open stream holds a server worker thread, so only subscribe while reports are in flight.
+    subscribeReportEvents(onReport) {
+        if (typeof EventSource === 'undefined') {
+            return () => {};
+        }
+
+        const source = new EventSource('/api/reports/events', { withCredentials: true });
+        const handle = (event) => {
+            try {
+                onReport(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Invalid report event:', error);
+            }
+        };
+
+        source.addEventListener('report', handle);
+        source.addEventListener('snapshot', (event) => {
+            try {
+                (JSON.parse(event.data).reports || []).forEach(onReport);
+            } catch (error) {
+                console.error('Invalid report snapshot:', error);
+            }
+        });
+
+        return () => source.close();
+    },
+
+    // Reports shown per history page; pass { limit, cursor } to page through
+    historyPageSize: 50,
+
+    // params: { limit, cursor, status, company, from, to, include_total }
+    // reportType may be a comma separated list of types
+    async getReportHistory(reportType = null, params = {}) {
+        return await this.request(`/reports/history${this.buildQuery({ type: reportType, ...params })}`);
+    },
+
+    // Companies per request when filling a company picker
+    companyPageSize: 200,
+
+    // Walk a company list endpoint page by page through its next_after cursor,
+    // asking only for the fields the picker shows. onPage receives each page as
+    // it arrives; resolves with every company.
+    async loadCompanyPages(fetchPage, fields, onPage) {
+        const companies = [];
+        let after = null;
+        do {
+            const page = await fetchPage({ limit: this.companyPageSize, fields, after });
+            const pageCompanies = page.companies || [];
+            companies.push(...pageCompanies);
+            if (onPage) {
+                onPage(pageCompanies);
+            }
+            after = page.has_more ? page.next_after : null;
+        } while (after);
+        return companies;
     },
 
-    async getCompaniesForReports() {
-        const response = await fetch('/api/reports/companies', {
+    async getCompaniesForReports(params = {}) {
+        const response = await fetch(`/api/reports/companies${this.buildQuery(params)}`, {
             method: 'GET',
             headers: {
                 'Content-Type': 'application/json'
@@ -166,8 +261,8 @@ const apiService = {
     },
 
     // Get FEDERTERZIARIO companies for reports
-    async getFederterziarioCompaniesForReports() {
-        const response = await fetch('/api/reports/federterziario-companies', {
+    async getFederterziarioCompaniesForReports(params = {}) {
+        const response = await fetch(`/api/reports/federterziario-companies${this.buildQuery(params)}`, {
             method: 'GET',
             headers: {
                 'Content-Type': 'application/json'
@@ -197,10 +292,26 @@ const apiService = {
         return await response.json();
     },
 
+    // Get details for several companies of a label ('suk', 'federterziario', 'startup') at once
+    async getCompanyDetailsBatch(companyNames, label = 'suk') {
+        return await this.request('/reports/company-details/batch', {
+            method: 'POST',
+            body: {
+                names: companyNames,
+                label: label
+            },
+        });
+    },
+
     async getCompanyRelationships(companyName) {
         return await this.request(`/reports/relationships/${encodeURIComponent(companyName)}`);
     },
 
+    // Multi-hop relationship graph, e.g. { depth: 2, min_weight: 3, limit: 10, types: ['partnership'] }
+    async getCompanySubgraph(label, companyName, params = {}) {
+        return await this.request(`/reports/subgraph/${encodeURIComponent(label)}/${encodeURIComponent(companyName)}${this.buildQuery(params)}`);
+    },
+
     async getFederterziarioCompanyRelationships(companyName) {
         return await this.request(`/reports/federterziario-relationships/${encodeURIComponent(companyName)}`);
     },
@@ -242,20 +353,24 @@ const apiService = {
     },
 
     // SUK Chat methods
-    async sendChatMessage(message, userId = null) {
+    // Pass conversationId to continue a conversation; without it the server starts a new one
+    async sendChatMessage(message, userId = null, conversationId = null) {
         return await this.request('/suk-chat/send-message', {
             method: 'POST',
             body: { 
                 message: message,
                 timestamp: new Date().toISOString(),
-                user_id: userId
+                user_id: userId,
+                conversation_id: conversationId
             },
         });
     },
 
-    async getChatHistory(userId = null) {
-        const params = userId ? `?user_id=${encodeURIComponent(userId)}` : '';
-        return await this.request(`/suk-chat/chat-history${params}`);
+    // Conversations shown per chat history page; pass { limit, before } to load older ones
+    chatHistoryPageSize: 20,
+
+    async getChatHistory(userId = null, params = {}) {
+        return await this.request(`/suk-chat/chat-history${this.buildQuery({ user_id: userId, ...params })}`);
     },
 
     async clearChatHistory() {
@@ -264,31 +379,29 @@ const apiService = {
         });
     },
 
-    async deleteConversation(userId, startTimestamp, endTimestamp) {
+    async deleteConversation(userId, conversationId) {
         return await this.request('/suk-chat/delete-conversation', {
             method: 'DELETE',
             body: {
                 user_id: userId,
-                start_timestamp: startTimestamp,
-                end_timestamp: endTimestamp
+                conversation_id: conversationId
             }
         });
     },
 
-    async updateConversationTitle(userId, startTimestamp, endTimestamp, title) {
+    async updateConversationTitle(userId, conversationId, title) {
         return await this.request('/suk-chat/update-conversation-title', {
             method: 'PUT',
             body: {
                 user_id: userId,
-                start_timestamp: startTimestamp,
-                end_timestamp: endTimestamp,
+                conversation_id: conversationId,
                 title: title
             }
         });
     },
 
     // STARTUP Chat methods
-    async sendStartupChatMessage(message, userId = null, region = '', province = '') {
+    async sendStartupChatMessage(message, userId = null, region = '', province = '', conversationId = null) {
         return await this.request('/startup-chat/send-message', {
             method: 'POST',
             body: { 
@@ -296,34 +409,32 @@ const apiService = {
                 timestamp: new Date().toISOString(),
                 user_id: userId,
                 region: region,
-                province: province
+                province: province,
+                conversation_id: conversationId
             },
         });
     },
 
-    async getStartupChatHistory(userId = null) {
-        const params = userId ? `?user_id=${encodeURIComponent(userId)}` : '';
-        return await this.request(`/startup-chat/chat-history${params}`);
+    async getStartupChatHistory(userId = null, params = {}) {
+        return await this.request(`/startup-chat/chat-history${this.buildQuery({ user_id: userId, ...params })}`);
     },
 
-    async deleteStartupConversation(userId, startTimestamp, endTimestamp) {
+    async deleteStartupConversation(userId, conversationId) {
         return await this.request('/startup-chat/delete-conversation', {
             method: 'DELETE',
             body: {
                 user_id: userId,
-                start_timestamp: startTimestamp,
-                end_timestamp: endTimestamp
+                conversation_id: conversationId
             }
         });
     },
 
-    async updateStartupConversationTitle(userId, startTimestamp, endTimestamp, title) {
+    async updateStartupConversationTitle(userId, conversationId, title) {
         return await this.request('/startup-chat/update-conversation-title', {
             method: 'PUT',
             body: {
                 user_id: userId,
-                start_timestamp: startTimestamp,
-                end_timestamp: endTimestamp,
+                conversation_id: conversationId,
                 title: title
             }
         });
@@ -363,9 +474,22 @@ const apiService = {
         }
     },
 
+    // Search FEDERTERZIARIO companies by name, sector and description
+    async searchFederterziarioCompanies(searchTerm) {
+        try {
+            const response = await this.request(`/reports/federterziario-companies/search?term=${encodeURIComponent(searchTerm)}`, {
+                method: 'GET'
+            });
+            return response.companies || [];
+        } catch (error) {
+            console.error('Error searching FEDERTERZIARIO companies:', error);
+            throw error;
+        }
+    },
+
     // STARTUP specific methods
-    async getStartupCompaniesForReports() {
-        return await this.request('/reports/startup-companies');
+    async getStartupCompaniesForReports(params = {}) {
+        return await this.request(`/reports/startup-companies${this.buildQuery(params)}`);
     },
 
     async getStartupCompanyDetails(companyName) {
@@ -0,0 +1,61 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from models import db, Report
+from services.report_retention import ReportArchive, ReportRetention
+from services.report_storage import ReportStorage
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Relative paths below resolve against tmp_path
+    monkeypatch.chdir(tmp_path)
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def _retention(storage, archive_dir):
+    archive = ReportArchive(storage, archive_dir=archive_dir)
+    policies = {'*': {'archive_after_days': 1}}
+    return ReportRetention(storage, archive, policies, orphan_grace=0)
+
+
+def test_bundles_survive_a_differently_spelled_archive_dir(app, tmp_path):
+    storage = ReportStorage(reports_dir='reports')
+    file_path, file_size, checksum = storage.save_chunks([b'%PDF-1.4 archived report'])
+
+    report = Report(user_id=1, company_name='ACME', report_type='suk', status='completed',
+                    file_path=file_path, file_size=file_size, checksum=checksum,
+                    created_at=datetime.utcnow() - timedelta(days=2))
+    db.session.add(report)
+    db.session.commit()
+
+    assert _retention(storage, 'reports/archive').archive_files() == 1
+    db.session.refresh(report)
+    assert not os.path.exists(file_path)
+
+    # Same directory, absolute and with a trailing slash
+    retention = _retention(storage, str(tmp_path / 'reports' / 'archive') + os.sep)
+    assert retention.reap_orphaned_bundles() == 0
+    assert retention.archive.bundles() == [report.archived_in]
+
+    retention.archive.restore(report.file_path, report.archived_in)
+    with open(report.file_path, 'rb') as f:
+        assert f.read() == b'%PDF-1.4 archived report'
+
+
+def test_unreferenced_bundles_are_reaped(app):
+    storage = ReportStorage(reports_dir='reports')
+    file_path, _, _ = storage.save_chunks([b'%PDF-1.4 orphaned report'])
+    retention = _retention(storage, 'reports/archive')
+    bundle, _ = retention.archive.write_bundle([file_path])
+
+    assert retention.reap_orphaned_bundles() == 1
+    assert not os.path.exists(retention.archive.path_for(bundle))